@@ -12,6 +12,7 @@ from app.ui_styles import (
     apply_landing_page_styles,
     add_home_music_line,
 )
+from app.session import init_user_model
 
 st.set_page_config(page_title="MLody", page_icon="🎵", layout="wide")
 
@@ -22,10 +23,9 @@ add_home_music_line()
 
 if "user_data" not in st.session_state:
     st.session_state.user_data = pd.DataFrame()
-if "model" not in st.session_state:
-    st.session_state.model = None
-if "scaler" not in st.session_state:
-    st.session_state.scaler = None
+
+# picks up the profile's stored model instead of starting from scratch
+init_user_model()
 
 st.markdown(
     """
@@ -7,10 +7,13 @@ root_dir = os.path.join(current_dir, "..")
 sys.path.append(root_dir)
 
 from src.audio_client import AudioClient
+from src.recommender import load_catalog, recommend
+from src.tracing import span
 
 from app.ui_styles import apply_global_styles, apply_build_profile_styles
 from app.views.initialize_user_model import initialize_user_model
 from app.views.active_learning import render_quiz_step
+from app.session import init_user_model, sync_user_model, train_user_model
 
 st.set_page_config(page_title="Build Profile | MLody", page_icon="🧬", layout="wide")
 
@@ -30,8 +33,14 @@ if "quiz_index" not in st.session_state:
 if "quiz_intro_done" not in st.session_state:
     st.session_state.quiz_intro_done = False
 
+# loads the profile's stored model, so a new session doesn't retrain
+init_user_model()
+
 client = AudioClient()
 
+# fold any likes/dislikes whose features finished into the session model
+sync_user_model()
+
 if st.session_state.profile_step == "search":
     initialize_user_model(client)
 
@@ -39,6 +48,18 @@ elif st.session_state.profile_step == "quiz":
     render_quiz_step(client)
 
 elif st.session_state.profile_step == "complete":
+    # only retrain when the labels changed since the last stored model
+    labels = (
+        tuple(s["id"] for s in st.session_state.get("liked_songs", [])),
+        tuple(s["id"] for s in st.session_state.get("disliked_songs", [])),
+    )
+    if st.session_state.get("model_labels") != labels:
+        with st.spinner("Training your model..."), span("page.build_profile.train"):
+            if train_user_model(client):
+                st.session_state.model_labels = labels
+            else:
+                st.warning("Not enough analyzable songs to train your model yet.")
+
     st.balloons()
 
     # Summary counts
@@ -103,5 +124,32 @@ elif st.session_state.profile_step == "complete":
             st.session_state.quiz_intro_done = False
             st.session_state.liked_songs = []
             st.session_state.disliked_songs = []
+            st.session_state.pending_labels = {}
+            st.session_state.labelled_rows = None
+            st.session_state.incremental_model = None
             st.rerun()
     st.markdown("</div>", unsafe_allow_html=True)
+
+    # -- recommendations --
+    # every track analysed so far is a candidate, so ranking the catalog
+    # needs no downloads
+    with span("page.build_profile.recommend"):
+        catalog = load_catalog(client.catalog_store)
+        labelled_ids = set(labels[0]) | set(labels[1])
+        picks = recommend(st.session_state.model, catalog, k=20, exclude=labelled_ids)
+
+    if picks:
+        st.subheader("Recommended for you")
+        st.caption(f"Top {len(picks)} of {len(catalog)} analyzed tracks")
+        st.dataframe(
+            [
+                {
+                    "Track": pick["trackName"],
+                    "Artist": pick["artistName"],
+                    "Like %": round(pick["probability"] * 100),
+                }
+                for pick in picks
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
@@ -3,100 +3,187 @@ import sys
 import numpy as np
 import streamlit as st
 import pandas as pd
-import joblib
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 root_dir = os.path.join(current_dir, "..", "..")
 sys.path.append(root_dir)
 
 from src.audio_client import AudioClient
+from src.feature_engine import DEFAULT_PROFILE, profile_columns
+from src.scoring import iter_scores, score_resolved
+from src.model_registry import registry
+from src.train_model import as_pipeline, model_path
+from src.tracing import span
 
-MODEL_PATH = os.path.join(root_dir, "models", "music_classifier.pkl")
 SCALER_PATH = os.path.join(root_dir, "models", "scaler.pkl")
 
+# the analyzer answers with the fast profile when its model has been
+# trained (ingest_data.py --profile fast, optimization.py --profile fast --save)
+ANALYSIS_PROFILES = {"Fast": "fast", "Full": "full", "Minimal": "minimal"}
+
 
 # loading assets
-def load_assets():
+def load_assets(profile=DEFAULT_PROFILE):
+    # the registry unpickles each file once per process and reloads it only
+    # when it changes on disk, so reruns don't pay for the forest again
     try:
-        model = joblib.load(MODEL_PATH)
-        scaler = joblib.load(SCALER_PATH)
-        return model, scaler
+        model = registry.get(model_path(profile))
+        # older artifacts kept the scaler in its own file
+        if profile == DEFAULT_PROFILE and os.path.exists(SCALER_PATH):
+            model = as_pipeline(model, registry.get(SCALER_PATH))
     except FileNotFoundError as e:
-        print("Cannot load assets")
-        return None, None
+        print(f"Cannot load assets for the {profile} profile")
+        return None
 
+    columns = getattr(model, "feature_names_in_", None)
+    if columns is not None and list(columns) != profile_columns(profile):
+        print(f"{model_path(profile)} was trained on a different feature profile")
+        return None
+    return model
 
-model, scaler = load_assets()
 
 st.set_page_config(page_title="AI Music Curator", page_icon="🎶")
 st.title("AI Music Curator 🎧")
 st.write("This model was trained on hardcoded artists for a demo (likes vs. dislikes)")
 
-if model is None or scaler is None:
+speed = st.radio(
+    "Analysis",
+    list(ANALYSIS_PROFILES),
+    horizontal=True,
+    help="Fast and Minimal analyze a shorter, lower-rate excerpt with fewer "
+    "features, using a model trained on that same profile",
+)
+profile = ANALYSIS_PROFILES[speed]
+model = load_assets(profile)
+
+if model is None and profile != DEFAULT_PROFILE:
+    st.caption(f"No model trained for {speed} analysis yet, using Full")
+    profile = DEFAULT_PROFILE
+    model = load_assets(profile)
+
+if model is None:
     st.error("Cannot find model! Please run model_trainer.py first.")
     st.stop()
 
-query = st.text_input("Search for a song!", "")
-
-if query:
-    client = AudioClient()
-    with st.spinner(f"Searching iTunes for '{query}'..."):
-        results = client.search_tracks(query, limit=5)
-
-    if not results:
-        st.warning(f"No songs found with '{query}. Please try again!")
-    else:
-        # displaying top 5 matches
-        st.subheader("Results")
-
-        for track in results:
-            col1, col2, col3 = st.columns([1, 2, 1])
 
-            with col1:
-                st.image(track["artworkUrl100"])
+def show_verdict(result):
+    """
+    Renders the MATCH / SKIP verdict for one score_resolved entry
+    """
+    if not result:
+        st.error("Could not analyze this audio")
+        return
 
-            with col2:
-                st.markdown(f"**{track['trackName']}**")
-                st.caption(track["artistName"])
-                st.audio(track["previewUrl"])
+    probability_of_likedness = result["probability"]
 
-            with col3:
-                button = f"Analyze_{track['trackId']}"
-
-                if st.button("Do I like this song?", key=button):
-                    with st.spinner("Listening and analyzing..."):
-                        path = client.download_preview(
-                            track["previewUrl"], track["trackId"]
+    if result["prediction"] == 1:
+        st.success(f"MATCH!! ({probability_of_likedness*100:.0f}%)")
+        st.write("The model predicts you should like this song!")
+    else:
+        st.error(f"SKIP!! ({probability_of_likedness*100:.0f}%)")
+        st.write("The model predicts you should skip this song.")
+
+    # lighter profiles skip beat tracking
+    if result["tempo"] is not None:
+        st.caption(f"Tempo: {result['tempo']:.0f} BPM")
+
+
+client = AudioClient(in_memory=True, profile=profile)
+
+mode = st.radio("Mode", ["Search", "Playlist"], horizontal=True)
+
+if mode == "Search":
+    query = st.text_input("Search for a song!", "")
+
+    if query:
+        with st.spinner(f"Searching Deezer for '{query}'..."):
+            results = client.search_tracks(query, limit=5)
+
+        if not results:
+            st.warning(f"No songs found with '{query}. Please try again!")
+        else:
+            # displaying top 5 matches
+            st.subheader("Results")
+            score_all = st.button("Score all results")
+
+            verdicts = []
+            for track in results:
+                col1, col2, col3 = st.columns([1, 2, 1])
+
+                with col1:
+                    st.image(track["artworkUrl100"])
+
+                with col2:
+                    st.markdown(f"**{track['trackName']}**")
+                    st.caption(track["artistName"])
+                    st.audio(track["previewUrl"])
+
+                with col3:
+                    button = f"Analyze_{track['trackId']}"
+                    verdict = st.container()
+                    verdicts.append(verdict)
+
+                    if not score_all and st.button("Do I like this song?", key=button):
+                        with verdict, st.spinner("Listening and analyzing..."):
+                            # repeat analyses come straight from the feature cache
+                            with span("page.analyzer.analyze"):
+                                result = score_resolved([track], model, client)[0]
+                            show_verdict(result)
+
+            if score_all:
+                # every result is analyzed in the background, verdicts fill in
+                # as each track finishes
+                with st.spinner("Listening and analyzing..."), span(
+                    "page.analyzer.score_all", tracks=len(results)
+                ):
+                    for i, result in iter_scores(results, model, client):
+                        with verdicts[i]:
+                            show_verdict(result)
+
+else:
+    playlist = st.text_input("Deezer playlist URL or ID", "")
+    max_tracks = st.slider("Tracks to score", 10, 500, 100, step=10)
+
+    if playlist and st.button("Score playlist"):
+        with st.spinner("Loading playlist..."):
+            tracks = client.get_playlist_tracks(playlist, limit=max_tracks)
+
+        if not tracks:
+            st.warning("No tracks found for that playlist. Please try again!")
+        else:
+            progress = st.progress(0.0, text=f"Scored 0 of {len(tracks)} tracks")
+            table = st.empty()
+            scored = []
+
+            # predictions stream into the table as each track finishes
+            with span("page.analyzer.playlist", tracks=len(tracks)):
+                for done, (i, result) in enumerate(
+                    iter_scores(tracks, model, client), start=1
+                ):
+                    if result:
+                        scored.append(
+                            {
+                                "Track": result["trackName"],
+                                "Artist": result["artistName"],
+                                "Verdict": "MATCH"
+                                if result["prediction"] == 1
+                                else "SKIP",
+                                "Like %": round(result["probability"] * 100),
+                                "Tempo": None
+                                if result["tempo"] is None
+                                else round(result["tempo"]),
+                            }
                         )
-
-                        if path:
-                            features = client.extract_features(path)
-
-                            if features:
-                                features_df = pd.DataFrame([features])
-
-                                X_scaled = scaler.transform(features_df)
-
-                                prediction = model.predict(X_scaled)[0]
-                                probability_of_likedness = model.predict_proba(
-                                    X_scaled
-                                )[0][1]
-
-                                if prediction == 1:
-                                    st.success(
-                                        f"MATCH!! ({probability_of_likedness*100:.0f}%)"
-                                    )
-                                    st.write(
-                                        "The model predicts you should like this song!"
-                                    )
-                                else:
-                                    st.error(
-                                        f"SKIP!! ({probability_of_likedness*100:.0f}%)"
-                                    )
-                                    st.write(
-                                        "The model predicts you should skip this song."
-                                    )
-
-                                st.caption(f"Tempo: {features['tempo']:.0f} BPM")
-                            else:
-                                st.error("Could not analyze this audio")
+                        table.dataframe(
+                            pd.DataFrame(scored).sort_values("Like %", ascending=False),
+                            hide_index=True,
+                            use_container_width=True,
+                        )
+                    progress.progress(
+                        done / len(tracks),
+                        text=f"Scored {done} of {len(tracks)} tracks",
+                    )
+
+            failed = len(tracks) - len(scored)
+            if failed:
+                st.caption(f"{failed} tracks had no preview or could not be analyzed")
@@ -0,0 +1,169 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+from src.feature_engine import schema_hash
+from src.incremental_model import IncrementalModel
+from src.model_registry import registry
+from src.model_store import ModelStore
+from src.train_model import (
+    build_training_frame,
+    labelled_row,
+    song_to_track,
+    split_features,
+    train_model_in_memory,
+    training_metrics,
+)
+
+# share the registry the pages load from, so each artifact is unpickled once
+model_store = ModelStore(registry=registry)
+
+# feature extraction for new labels runs here so clicks never wait on DSP
+feature_pool = ThreadPoolExecutor(max_workers=2)
+
+
+def session_profile_id():
+    """
+    Profile the session's models are stored under. A ?profile= query
+    parameter picks an existing profile, e.g. from a bookmarked link.
+    Otherwise the session gets a fresh random ID, written back to the URL
+    so a reload or bookmark finds the same models again.
+    """
+    profile_id = st.query_params.get("profile")
+    if not profile_id:
+        profile_id = uuid.uuid4().hex
+        st.query_params["profile"] = profile_id
+    return profile_id
+
+
+def init_user_model():
+    """
+    Sets up the per-session model slots and, once per session, loads the
+    profile's latest stored model that matches the current feature schema
+    """
+    if "profile_id" not in st.session_state:
+        st.session_state.profile_id = session_profile_id()
+    if "model" not in st.session_state:
+        st.session_state.model = None
+
+    if st.session_state.model is None and not st.session_state.get(
+        "model_store_checked"
+    ):
+        st.session_state.model_store_checked = True
+        stored = model_store.load_latest(st.session_state.profile_id, schema_hash())
+        if stored:
+            model, meta = stored
+            st.session_state.model = model
+            st.session_state.model_meta = meta
+
+
+def train_user_model(client):
+    """
+    Trains on the session's liked/disliked songs and stores the result as
+    the profile's newest model version
+    Returns:
+        bool: whether a model was trained
+    """
+    df = build_training_frame(
+        client,
+        st.session_state.get("liked_songs", []),
+        st.session_state.get("disliked_songs", []),
+    )
+    model = train_model_in_memory(df)
+    if model is None:
+        return False
+
+    metrics = training_metrics(model, df)
+    version = model_store.save(
+        st.session_state.profile_id,
+        model,
+        schema_hash(list(model.feature_names_in_)),
+        n_rows=len(df),
+        metrics=metrics,
+    )
+
+    st.session_state.model = model
+    st.session_state.model_meta = {
+        "version": version,
+        "n_rows": len(df),
+        "metrics": metrics,
+    }
+    return True
+
+
+def prefetch_features(client, songs):
+    """
+    Warms the feature cache for songs the user is likely to label next
+    """
+    for song in songs:
+        feature_pool.submit(client.features_for_track, song_to_track(song))
+
+
+def record_label(client, song, label):
+    """
+    Queues a new like (1) or dislike (0) for the session's incremental
+    model, the features are extracted in the background
+    """
+    pending = st.session_state.setdefault("pending_labels", {})
+    future = feature_pool.submit(client.features_for_track, song_to_track(song))
+    pending[song["id"]] = (song, label, future)
+
+
+def forget_label(song_id):
+    """
+    Drops a label, the incremental model can't unlearn so it is refitted
+    """
+    st.session_state.setdefault("pending_labels", {}).pop(song_id, None)
+
+    rows = st.session_state.get("labelled_rows")
+    if rows is not None and song_id in set(rows["track_id"]):
+        st.session_state.labelled_rows = rows[rows["track_id"] != song_id]
+        st.session_state.model_needs_refit = True
+
+
+def sync_user_model():
+    """
+    Applies every label whose features are ready to the session's
+    incremental model. Updates are partial_fit calls, a full refit only
+    happens on drift, on removed labels, or before the first fit.
+    """
+    pending = st.session_state.setdefault("pending_labels", {})
+    ready = [song_id for song_id, (_, _, f) in pending.items() if f.done()]
+    new_rows = []
+    for song_id in ready:
+        song, label, future = pending.pop(song_id)
+        features = future.result()
+        if features:
+            new_rows.append(labelled_row(features, song, label))
+
+    needs_refit = st.session_state.pop("model_needs_refit", False)
+    if not new_rows and not needs_refit:
+        return
+
+    rows = st.session_state.get("labelled_rows")
+    if new_rows:
+        new_df = pd.DataFrame(new_rows)
+        rows = new_df if rows is None else pd.concat([rows, new_df], ignore_index=True)
+        st.session_state.labelled_rows = rows
+    if rows is None or rows.empty:
+        if needs_refit:
+            # the last label was withdrawn, nothing is left to learn from
+            st.session_state.incremental_model = None
+            st.session_state.model = None
+            st.session_state.pop("model_meta", None)
+        return
+
+    learner = st.session_state.get("incremental_model")
+    if learner is None:
+        learner = st.session_state.incremental_model = IncrementalModel()
+
+    if not needs_refit and new_rows:
+        X_new, y_new = split_features(new_df)
+        needs_refit = learner.update(X_new, y_new)
+    if needs_refit:
+        X, y = split_features(rows)
+        learner.fit(X, y)
+
+    st.session_state.model = learner.pipeline
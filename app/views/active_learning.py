@@ -1,4 +1,5 @@
 import streamlit as st
+import asyncio
 import time
 import sys
 from pathlib import Path
@@ -7,6 +8,9 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from particles import render_particles
 
+from src.async_audio_client import AsyncAudioClient
+from app.session import prefetch_features, record_label
+
 
 # --- TARGET DIAGNOSTIC SONGS (ordered) ---
 TARGET_SONGS = [
@@ -87,25 +91,27 @@ def render_quiz_step(client):
     # initialize cached diag tracks on first run
     if "diag_tracks" not in st.session_state:
         st.session_state.diag_tracks = []
-        for i, t in enumerate(TARGET_SONGS):
+
+        # resolve every explicit Deezer id at once, the first render waits for
+        # one round trip instead of ten
+        lookups = asyncio.run(
+            AsyncAudioClient(client).get_tracks(
+                [t.get("deezer_id") for t in TARGET_SONGS]
+            )
+        )
+
+        for i, (t, data) in enumerate(zip(TARGET_SONGS, lookups)):
             # If we have an explicit Deezer track id, prefer the track lookup (exact version)
-            if t.get("deezer_id"):
-                data = None
-                try:
-                    data = client.get_track(t["deezer_id"])
-                except Exception:
-                    data = None
-
-                if data:
-                    song = {
-                        "id": data.get("trackId") or f"diag_{i}",
-                        "name": data.get("trackName") or t["name"],
-                        "artist": data.get("artistName") or t["artist"],
-                        "img": data.get("artworkUrl100", "https://placehold.co/100"),
-                        "preview": data.get("previewUrl"),
-                    }
-                    st.session_state.diag_tracks.append(song)
-                    continue
+            if data:
+                song = {
+                    "id": data.get("trackId") or f"diag_{i}",
+                    "name": data.get("trackName") or t["name"],
+                    "artist": data.get("artistName") or t["artist"],
+                    "img": data.get("artworkUrl100", "https://placehold.co/100"),
+                    "preview": data.get("previewUrl"),
+                }
+                st.session_state.diag_tracks.append(song)
+                continue
 
             # fallback: simple search (take first result)
             query = f"{t['name']} {t['artist']}"
@@ -127,6 +133,10 @@ def render_quiz_step(client):
 
             st.session_state.diag_tracks.append(song)
 
+        # extract quiz features in the background while the user listens,
+        # so each answer updates the model without waiting on DSP
+        prefetch_features(client, st.session_state.diag_tracks)
+
     # helper to advance
     def next_question(liked):
         current = st.session_state.diag_tracks[st.session_state.quiz_index]
@@ -142,6 +152,7 @@ def render_quiz_step(client):
             st.session_state.liked_songs.append(song_data)
         else:
             st.session_state.disliked_songs.append(song_data)
+        record_label(client, song_data, 1 if liked else 0)
 
         if st.session_state.quiz_index < len(st.session_state.diag_tracks) - 1:
             st.session_state.quiz_index += 1
@@ -7,6 +7,8 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from particles import render_particles
 
+from app.session import forget_label, record_label
+
 
 def initialize_user_model(client):
     """
@@ -19,6 +21,7 @@ def initialize_user_model(client):
         st.session_state[target_key] = [
             s for s in st.session_state[target_key] if s["id"] != song_id
         ]
+        forget_label(song_id)
 
     def add_song(song, category="liked"):
         target_key = f"{category}_songs"
@@ -43,6 +46,8 @@ def initialize_user_model(client):
 
         if not any(s["id"] == song["id"] for s in target):
             target.append(song)
+            # the model picks this up incrementally once features are ready
+            record_label(client, song, 1 if category == "liked" else 0)
             return True
         else:
             return False
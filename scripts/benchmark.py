@@ -0,0 +1,328 @@
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+import sklearn
+import soundfile as sf
+import librosa
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(current_dir, "..")
+sys.path.append(root_dir)
+sys.path.append(current_dir)
+
+from benchmark_feature_engine import synthetic_clip
+from src.audio_client import AudioClient
+from src.catalog_store import CatalogStore
+from src.feature_cache import FeatureCache
+from src.feature_engine import (
+    DEFAULT_PROFILE,
+    FEATURE_COLUMNS,
+    PROFILES,
+    FeatureEngine,
+    summarize_data,
+    summarize_matrix,
+)
+from src.recommender import Catalog, recommend
+from src.scoring import feature_matrix, predict_matrix
+from src.train_model import train_model_in_memory
+
+# previews are 44.1 kHz, so decoding also exercises the resampler
+SOURCE_RATE = 44100
+SAMPLE_RATE = 22050
+
+REPORT_DIR = os.path.join(root_dir, "data", "reports", "benchmarks")
+
+warnings.filterwarnings("ignore")
+
+
+def synthetic_clips(n_clips, duration):
+    """
+    Deterministic WAV-encoded clips, held in memory like downloaded previews
+    """
+    clips = []
+    for seed in range(n_clips):
+        buffer = io.BytesIO()
+        sf.write(
+            buffer,
+            synthetic_clip(duration=duration, sample_rate=SOURCE_RATE, seed=seed),
+            SOURCE_RATE,
+            format="WAV",
+        )
+        clips.append(buffer.getvalue())
+    return clips
+
+
+def synthetic_rows(n_rows, seed=0):
+    """
+    Labelled feature rows shaped like ingestion output
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, len(FEATURE_COLUMNS))).astype(np.float32)
+    df = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+    df["label"] = (X[:, 0] + 0.5 * rng.normal(size=n_rows) > 0).astype(int)
+    df["track_id"] = np.arange(n_rows)
+    return df
+
+
+def measure(stage, items, unit, repeats):
+    """
+    Times stage() over repeats runs, then runs it once more under
+    tracemalloc for peak memory (tracing slows it, so that run isn't timed)
+    Args:
+        stage (callable): the work to measure
+        items (int): clips or rows processed per call, for throughput
+        unit (str): "clips" or "rows"
+    """
+    # warm-up, so numba compilation and filterbank caches don't count
+    stage()
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = float(np.median(timings))
+    return {
+        "seconds_median": median,
+        "seconds_min": float(np.min(timings)),
+        "items": items,
+        "unit": unit,
+        f"{unit}_per_sec": items / median if median > 0 else None,
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+
+def scratch_client(state_dir, profile=DEFAULT_PROFILE):
+    """
+    AudioClient whose feature cache, catalog and temp files live in
+    state_dir, so benchmark runs leave the app's data untouched
+    """
+    return AudioClient(
+        temp_directory=os.path.join(state_dir, "temp"),
+        feature_cache=FeatureCache(
+            os.path.join(state_dir, "features.sqlite"), profile=profile
+        ),
+        catalog_store=CatalogStore(
+            os.path.join(state_dir, "catalog.sqlite"), profile=profile
+        ),
+        profile=profile,
+    )
+
+
+def run_benchmarks(
+    n_clips=8, duration=30, n_rows=2000, catalog_rows=100_000, repeats=3
+):
+    """
+    Measures each stage of the audio -> features -> prediction path
+    Returns:
+        dict: stage name -> measurement, see measure()
+    """
+    # only the decoding and extraction methods are used, nothing is fetched.
+    # the clients cache into a scratch directory rather than data/
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as state_dir:
+        client = scratch_client(state_dir)
+        profile_clients = {
+            name: scratch_client(state_dir, name)
+            for name in PROFILES
+            if name != DEFAULT_PROFILE
+        }
+        engine = FeatureEngine()
+        clips = synthetic_clips(n_clips, duration)
+        waveforms = [client.decode_audio(clip, duration)[0] for clip in clips]
+
+        mfcc = librosa.feature.mfcc(y=waveforms[0], sr=SAMPLE_RATE, n_mfcc=13)
+        rows = synthetic_rows(n_rows)
+        model = train_model_in_memory(rows)
+        X = rows[FEATURE_COLUMNS]
+        feature_rows = X.to_dict(orient="records")
+        catalog_X = np.random.default_rng(1).normal(
+            size=(catalog_rows, len(FEATURE_COLUMNS))
+        )
+        catalog = Catalog(np.arange(catalog_rows), catalog_X, [{}] * catalog_rows)
+
+        stages = {
+            # bytes -> waveform, as AudioClient does for in-memory previews
+            "decode": (
+                lambda: [client.decode_audio(c, duration) for c in clips],
+                n_clips,
+                "clips",
+            ),
+            # waveform -> feature dict
+            "extract_features": (
+                lambda: [engine.extract(w, SAMPLE_RATE) for w in waveforms],
+                n_clips,
+                "clips",
+            ),
+            # bytes -> feature dict, the whole per-track cost of ingestion
+            "extract_from_bytes": (
+                lambda: [
+                    client.extract_features_from_bytes(c, duration) for c in clips
+                ],
+                n_clips,
+                "clips",
+            ),
+            # the lighter profiles decode a shorter, lower-rate excerpt
+            **{
+                f"extract_from_bytes_{name}": (
+                    lambda c=profile_client: [
+                        c.extract_features_from_bytes(b) for b in clips
+                    ],
+                    n_clips,
+                    "clips",
+                )
+                for name, profile_client in profile_clients.items()
+            },
+            # per-row statistics, the original summarize_data loop
+            "summarize_data": (
+                lambda: [summarize_data(row, "mfcc") for row in mfcc],
+                len(mfcc),
+                "rows",
+            ),
+            "summarize_matrix": (lambda: summarize_matrix(mfcc), len(mfcc), "rows"),
+            "train_model_in_memory": (
+                lambda: train_model_in_memory(rows),
+                n_rows,
+                "rows",
+            ),
+            # the analyzer scores one track per click
+            "predict_single": (
+                lambda: predict_matrix(model, feature_matrix(feature_rows[:1], model)),
+                1,
+                "rows",
+            ),
+            # score-all and playlist modes stack every track into one matrix
+            "predict_batch": (
+                lambda: predict_matrix(model, feature_matrix(feature_rows, model)),
+                n_rows,
+                "rows",
+            ),
+            "recommend": (
+                lambda: recommend(model, catalog, k=20),
+                catalog_rows,
+                "rows",
+            ),
+        }
+
+        results = {}
+        for name, (stage, items, unit) in stages.items():
+            print(f"benchmarking {name}...", flush=True)
+            results[name] = measure(stage, items, unit, repeats)
+        return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=root_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "librosa": librosa.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def print_table(results, baseline=None):
+    header = f"{'stage':<28}{'median':>12}{'throughput':>22}{'peak MB':>10}"
+    if baseline:
+        header += f"{'vs base':>10}"
+    print(header)
+
+    for name, result in results.items():
+        unit = result["unit"]
+        line = (
+            f"{name:<28}{result['seconds_median'] * 1000:>10.1f}ms"
+            f"{result[f'{unit}_per_sec']:>16.1f} {unit}/s"
+            f"{result['peak_mb']:>10.1f}"
+        )
+        base = (baseline or {}).get(name)
+        if base:
+            # time per item, so runs with different sizes still compare.
+            # > 1 means this run is slower than the baseline
+            ratio = (result["seconds_median"] / result["items"]) / (
+                base["seconds_median"] / base["items"]
+            )
+            line += f"{ratio:>9.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the audio -> features -> prediction path offline"
+    )
+    parser.add_argument("--clips", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--catalog-rows", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="JSON results path (default: data/reports/benchmarks/<commit>.json)",
+    )
+    parser.add_argument(
+        "--compare", default=None, help="earlier results JSON to compare against"
+    )
+    args = parser.parse_args()
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    results = run_benchmarks(
+        n_clips=args.clips,
+        duration=args.duration,
+        n_rows=args.rows,
+        catalog_rows=args.catalog_rows,
+        repeats=args.repeats,
+    )
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.time(),
+        "environment": environment(),
+        "parameters": vars(args),
+        "stages": results,
+    }
+    output = args.output or os.path.join(REPORT_DIR, f"{commit or 'latest'}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["stages"]
+
+    print_table(results, baseline)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import librosa
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(current_dir, "..")
+sys.path.append(root_dir)
+
+from src.feature_engine import FeatureEngine, summarize_data
+
+SAMPLE_RATE = 22050
+
+warnings.filterwarnings("ignore")
+
+
+def synthetic_clip(duration=30, sample_rate=SAMPLE_RATE, seed=0):
+    """
+    Builds a deterministic test clip: a chord, a kick on every beat
+    at 120 BPM and some noise, so rhythm and spectral features are non-trivial
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+
+    chord = sum(np.sin(2 * np.pi * f * t) for f in (220.0, 277.18, 329.63))
+    kick = np.zeros_like(t)
+    beat_samples = int(0.5 * sample_rate)
+    decay = np.exp(-np.arange(beat_samples) / (0.03 * sample_rate))
+    for start in range(0, len(t) - beat_samples, beat_samples):
+        kick[start : start + beat_samples] += (
+            np.sin(2 * np.pi * 60 * t[:beat_samples]) * decay
+        )
+
+    clip = 0.2 * chord + 0.8 * kick + 0.05 * rng.standard_normal(len(t))
+    return (clip / np.max(np.abs(clip))).astype(np.float32)
+
+
+def legacy_features(raw_waveform, sample_rate):
+    """
+    The extractor as it was before FeatureEngine: every feature re-derives
+    its own STFT or mel spectrogram from the raw waveform
+    """
+    features = {}
+
+    onset = librosa.onset.onset_strength(y=raw_waveform, sr=sample_rate)
+    tempo = librosa.beat.tempo(onset_envelope=onset, sr=sample_rate)[0]
+    features["tempo"] = float(tempo)
+
+    beat_frames = librosa.beat.beat_track(onset_envelope=onset, sr=sample_rate)[1]
+    if len(beat_frames) > 1:
+        beat_times = librosa.frames_to_time(beat_frames, sr=sample_rate)
+        features.update(summarize_data(np.diff(beat_times), "beat_interval"))
+    else:
+        features.update(
+            {
+                "beat_interval_mean": 0.0,
+                "beat_interval_std": 0.0,
+                "beat_interval_min": 0.0,
+                "beat_interval_max": 0.0,
+            }
+        )
+
+    mfcc = librosa.feature.mfcc(y=raw_waveform, sr=sample_rate, n_mfcc=13)
+    mfcc_delta = librosa.feature.delta(mfcc)
+    mfcc_delta_2 = librosa.feature.delta(mfcc, order=2)
+    for i in range(mfcc.shape[0]):
+        features.update(summarize_data(mfcc[i], f"mfcc_{i+1}"))
+        features.update(summarize_data(mfcc_delta[i], f"mfcc_delta_{i+1}"))
+        features.update(summarize_data(mfcc_delta_2[i], f"mfcc_delta_2_{i+1}"))
+
+    spectral_centroid = librosa.feature.spectral_centroid(
+        y=raw_waveform, sr=sample_rate
+    )[0]
+    spectral_bandwidth = librosa.feature.spectral_bandwidth(
+        y=raw_waveform, sr=sample_rate
+    )[0]
+    spectral_rolloff = librosa.feature.spectral_rolloff(y=raw_waveform, sr=sample_rate)
+    spectral_contrast = librosa.feature.spectral_contrast(
+        y=raw_waveform, sr=sample_rate
+    )
+    features.update(summarize_data(spectral_centroid, "spectral_centriod"))
+    features.update(summarize_data(spectral_bandwidth, "spectral_bandwidth"))
+    features.update(summarize_data(spectral_rolloff, "spectral_rolloff"))
+    for i in range(spectral_contrast.shape[0]):
+        features.update(
+            summarize_data(spectral_contrast[i], f"spectral_contrast_{i+1}")
+        )
+
+    chroma = librosa.feature.chroma_stft(y=raw_waveform, sr=sample_rate)
+    for i in range(chroma.shape[0]):
+        features.update(summarize_data(chroma[i], f"chroma_{i+1}"))
+
+    root_mean_square_value = librosa.feature.rms(y=raw_waveform)[0]
+    zero_crossing_rate = librosa.feature.zero_crossing_rate(y=raw_waveform)[0]
+    features.update(summarize_data(root_mean_square_value, "rms"))
+    features.update(summarize_data(zero_crossing_rate, "zcr"))
+
+    return features
+
+
+def time_per_clip(extract, clip, repeats):
+    # one warm-up call so numba/jit and filterbank caches don't skew the numbers
+    extract(clip, SAMPLE_RATE)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        extract(clip, SAMPLE_RATE)
+    return (time.perf_counter() - start) / repeats
+
+
+def compare(legacy, engine, rtol=1e-5, atol=1e-6):
+    if list(legacy) != list(engine):
+        print("column mismatch between legacy and engine output")
+        return False
+
+    mismatched = [
+        col
+        for col in legacy
+        if not np.isclose(legacy[col], engine[col], rtol=rtol, atol=atol)
+    ]
+    for col in mismatched:
+        print(f" -- {col}: legacy={legacy[col]!r} engine={engine[col]!r}")
+    return not mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Per-clip timing of the shared-STFT feature engine"
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    clip = synthetic_clip(duration=args.duration)
+    engine = FeatureEngine()
+
+    legacy_out = legacy_features(clip, SAMPLE_RATE)
+    engine_out = engine.extract(clip, SAMPLE_RATE)
+    identical = compare(legacy_out, engine_out)
+    print(f"columns: {len(engine_out)}, outputs match: {identical}")
+
+    legacy_time = time_per_clip(legacy_features, clip, args.repeats)
+    engine_time = time_per_clip(engine.extract, clip, args.repeats)
+
+    print(f"legacy extractor : {legacy_time * 1000:.1f} ms/clip")
+    print(f"feature engine   : {engine_time * 1000:.1f} ms/clip")
+    print(f"speedup          : {legacy_time / engine_time:.2f}x")
+
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
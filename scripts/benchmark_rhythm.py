@@ -0,0 +1,116 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import librosa
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(current_dir, "..")
+sys.path.append(root_dir)
+sys.path.append(current_dir)
+
+from benchmark_feature_engine import SAMPLE_RATE, synthetic_clip
+from src.feature_engine import FeatureEngine
+
+warnings.filterwarnings("ignore")
+
+
+def two_pass_rhythm(onset, sample_rate, hop_length=512):
+    """
+    The rhythm block as it was: a tempo estimate, then beat_track on the
+    same envelope, which estimates the tempo all over again
+    """
+    tempo = librosa.beat.tempo(
+        onset_envelope=onset, sr=sample_rate, hop_length=hop_length
+    )[0]
+    beat_frames = librosa.beat.beat_track(
+        onset_envelope=onset, sr=sample_rate, hop_length=hop_length
+    )[1]
+    return tempo, beat_frames
+
+
+def test_envelopes(duration, n_clips):
+    """
+    Onset envelopes of the synthetic clips, plus noise and silence for the
+    edge cases (no clear beat, no onsets at all)
+    """
+    clips = [synthetic_clip(duration=duration, seed=seed) for seed in range(n_clips)]
+    rng = np.random.default_rng(0)
+    clips.append(rng.standard_normal(int(duration * SAMPLE_RATE)).astype(np.float32))
+    clips.append(np.zeros(int(duration * SAMPLE_RATE), dtype=np.float32))
+    return [librosa.onset.onset_strength(y=clip, sr=SAMPLE_RATE) for clip in clips]
+
+
+def beat_intervals(beat_frames, sample_rate):
+    if len(beat_frames) < 2:
+        return np.zeros(0)
+    return np.diff(librosa.frames_to_time(beat_frames, sr=sample_rate))
+
+
+def compare(envelopes, engine):
+    matches = True
+    for i, onset in enumerate(envelopes):
+        old_tempo, old_beats = two_pass_rhythm(onset, SAMPLE_RATE)
+        new_tempo, new_beats = engine.analyze_rhythm(onset, SAMPLE_RATE)
+
+        same = (
+            old_tempo == new_tempo
+            and np.array_equal(old_beats, new_beats)
+            and np.array_equal(
+                beat_intervals(old_beats, SAMPLE_RATE),
+                beat_intervals(new_beats, SAMPLE_RATE),
+            )
+        )
+        if not same:
+            print(
+                f" -- envelope {i}: two-pass tempo={old_tempo!r} "
+                f"beats={len(old_beats)}, single pass tempo={new_tempo!r} "
+                f"beats={len(new_beats)}"
+            )
+        matches = matches and same
+    return matches
+
+
+def time_per_envelope(analyze, envelopes, repeats):
+    # one warm-up pass so numba compilation doesn't skew the numbers
+    for onset in envelopes:
+        analyze(onset, SAMPLE_RATE)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for onset in envelopes:
+            analyze(onset, SAMPLE_RATE)
+    return (time.perf_counter() - start) / (repeats * len(envelopes))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Single-pass beat analysis against the old tempo + beat_track"
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--clips", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = FeatureEngine()
+    envelopes = test_envelopes(args.duration, args.clips)
+
+    identical = compare(envelopes, engine)
+    print(f"envelopes: {len(envelopes)}, outputs match: {identical}")
+
+    two_pass_time = time_per_envelope(two_pass_rhythm, envelopes, args.repeats)
+    single_time = time_per_envelope(engine.analyze_rhythm, envelopes, args.repeats)
+
+    print(f"tempo + beat_track : {two_pass_time * 1000:.1f} ms/clip")
+    print(f"single beat pass   : {single_time * 1000:.1f} ms/clip")
+    print(f"speedup            : {two_pass_time / single_time:.2f}x")
+
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
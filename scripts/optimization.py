@@ -1,108 +1,315 @@
-import pandas as pd
-import numpy as np
+import argparse
+import json
 import os
 import sys
+import time
+
+import pandas as pd
+import joblib
+from joblib import Memory
+from scipy.stats import loguniform, randint
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 root_dir = os.path.join(current_dir, "..")
 sys.path.append(root_dir)
 
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.model_selection import GridSearchCV, train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import classification_report
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import (
+    GridSearchCV,
+    HalvingGridSearchCV,
+    RandomizedSearchCV,
+    StratifiedKFold,
+    train_test_split,
+)
+
+from src.feature_engine import DEFAULT_PROFILE, PROFILES
+from src.train_model import build_pipeline, model_path
+from src.training_store import TrainingStore, store_path
+
+REPORT_DIR = os.path.join(root_dir, "data", "reports")
+# fitted scalers are cached here per fold, and reused across runs
+CACHE_DIR = os.path.join(root_dir, "data", "cache", "pipeline")
+
+SEARCH_MODES = ("halving", "random", "grid")
+
+RANDOM_FOREST_PARAMETERS = {
+    "n_estimators": [100, 200, 250, 300],
+    "max_depth": [None, 3, 6, 10],
+    "min_samples_split": [5, 10, 15, 20],
+}
+
+# boosting stages are meant to be shallow, unlimited depth only fits each
+# stage to the training noise at many times the cost
+GRADIENT_BOOSTING_PARAMETERS = {
+    "n_estimators": [25, 50, 100, 200],
+    "learning_rate": [0.01, 0.1, 0.2, 0.5],
+    "max_depth": [3, 6, 10],
+}
+
+# continuous ranges for random search, same bounds as the grids above
+RANDOM_FOREST_DISTRIBUTIONS = {
+    "n_estimators": randint(100, 301),
+    "max_depth": [None, 3, 6, 10],
+    "min_samples_split": randint(5, 21),
+}
 
-DATA_PATH = os.path.join(root_dir, "data", "raw", "training_data.csv")
+GRADIENT_BOOSTING_DISTRIBUTIONS = {
+    "n_estimators": randint(25, 201),
+    "learning_rate": loguniform(0.01, 0.5),
+    "max_depth": [3, 6, 10],
+}
 
 
-def load_data():
-    if not os.path.exists(DATA_PATH):
+def load_data(profile=DEFAULT_PROFILE):
+    data_path = store_path(profile)
+    if not os.path.exists(data_path):
         print("data file not found")
         return None, None
 
-    df = pd.read_csv(DATA_PATH)
+    # only the feature and label columns are read, as float32
+    return TrainingStore(data_path, profile=profile).read_features()
 
-    metadata_cols = [
-        "track_name",
-        "artist",
-        "track_id",
-        "preview_url",
-        "filename",
-        "label",
-    ]
-    existing_cols = [col for col in metadata_cols if col in df.columns]
 
-    # features
-    X = df.drop(columns=existing_cols)
-    # target var
-    y = df["label"]
-    return X, y
+def prefixed(parameters):
+    return {f"model__{name}": values for name, values in parameters.items()}
 
 
-def optimize():
-    X, y = load_data()
+def make_search(mode, pipeline, grid, distributions, cv, n_iter, n_jobs):
+    """
+    Builds the search object for a mode
+    Args:
+        mode (str): "halving" (successive halving over the grid), "random"
+            (n_iter samples from the distributions) or "grid" (exhaustive)
+    """
+    common = {"scoring": "accuracy", "n_jobs": n_jobs}
+    if mode == "halving":
+        # every candidate starts on a small share of the rows, only the best
+        # third survive each round to be refit on three times as many
+        return HalvingGridSearchCV(
+            pipeline, prefixed(grid), cv=cv, factor=3, random_state=42, **common
+        )
+    if mode == "random":
+        return RandomizedSearchCV(
+            pipeline,
+            prefixed(distributions),
+            n_iter=n_iter,
+            cv=cv,
+            random_state=42,
+            **common,
+        )
+    return GridSearchCV(pipeline, prefixed(grid), cv=cv, **common)
 
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X_scaled, y, test_size=0.2, random_state=42
+def candidate_rows(name, search, n_splits):
+    """
+    One report row per evaluated candidate, with its wall time summed
+    over folds
+    """
+    results = pd.DataFrame(search.cv_results_)
+    rows = pd.DataFrame(
+        {
+            "model": name,
+            "params": [
+                json.dumps(
+                    {k.replace("model__", ""): v for k, v in p.items()}, default=str
+                )
+                for p in results["params"]
+            ],
+            "mean_test_score": results["mean_test_score"],
+            "std_test_score": results["std_test_score"],
+            "rank": results["rank_test_score"],
+            "fit_seconds": results["mean_fit_time"] * n_splits,
+            "score_seconds": results["mean_score_time"] * n_splits,
+        }
     )
+    rows["wall_seconds"] = rows["fit_seconds"] + rows["score_seconds"]
+
+    # halving evaluates candidates over several rounds on growing subsets
+    if "iter" in results:
+        rows["round"] = results["iter"]
+        rows["n_resources"] = results["n_resources"]
+    return rows
+
+
+def write_report(mode, candidates, summary, report_dir=REPORT_DIR):
+    """
+    Writes optimization_<mode>.csv (one row per candidate) and
+    optimization_<mode>.json (summary and candidates), so runs in
+    different modes can be compared directly. Profiles other than the
+    default pass "<mode>_<profile>" as mode.
+    """
+    os.makedirs(report_dir, exist_ok=True)
+    csv_path = os.path.join(report_dir, f"optimization_{mode}.csv")
+    json_path = os.path.join(report_dir, f"optimization_{mode}.json")
+
+    candidates.to_csv(csv_path, index=False)
+    with open(json_path, "w") as f:
+        json.dump(
+            {"summary": summary, "candidates": candidates.to_dict(orient="records")},
+            f,
+            indent=2,
+            default=str,
+        )
+    print(f"report written to {csv_path} and {json_path}")
+
+
+def save_model(pipeline, path=None):
+    """
+    Writes the winning pipeline where the Single Song Analyzer loads it.
+    Written to a temp file and renamed, so a running app never reads a
+    half written model. path defaults to the full profile's model.
+    """
+    path = path or model_path()
+    # the fit cache is a local directory, it doesn't belong in the artifact
+    pipeline.set_params(memory=None)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    joblib.dump(pipeline, temp_path)
+    os.replace(temp_path, path)
+    print(f"model written to {path}")
 
-    print("Tuning Random Forest...")
-    random_forest_parameters = {
-        "n_estimators": [100, 200, 250, 300],
-        "max_depth": [None, 3, 6, 10],
-        "min_samples_split": [5, 10, 15, 20],
-    }
 
-    random_forest_grid = GridSearchCV(
-        RandomForestClassifier(random_state=42),
-        random_forest_parameters,
-        cv=5,
-        scoring="accuracy",
-        n_jobs=-1,
+def optimize(
+    mode="halving",
+    n_iter=20,
+    n_splits=5,
+    n_jobs=-1,
+    save=False,
+    profile=DEFAULT_PROFILE,
+):
+    X, y = load_data(profile)
+    if X is None:
+        return
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
     )
-    random_forest_grid.fit(X_train, y_train)
 
-    print(f"Best Random Forest Accuracy: {random_forest_grid.best_score_:.2%}")
-    print(f"Best Random Forest Parameters: {random_forest_grid.best_params_}")
+    # -- shared folds --
+    # halving subsamples the rows each round, so it needs the splitter
+    # itself. The other modes get the fold indices computed once up front
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
+    cv = splitter if mode == "halving" else list(splitter.split(X_train, y_train))
 
-    print("Tuning Gradient Boosting...")
-    gradient_boosting_parameters = {
-        "n_estimators": [25, 50, 100, 200],
-        "learning_rate": [0.01, 0.1, 0.2, 0.5],
-        "max_depth": [None, 3, 6, 10],
+    candidates = []
+    summary = {
+        "mode": mode,
+        "profile": profile,
+        "n_splits": n_splits,
+        "n_train": len(X_train),
+        "n_test": len(X_test),
+        "models": {},
     }
+    best_models = {}
 
-    gradient_boosting_grid = GridSearchCV(
-        GradientBoostingClassifier(random_state=42),
-        gradient_boosting_parameters,
-        cv=5,
-        scoring="accuracy",
-        n_jobs=-1,
-    )
-    gradient_boosting_grid.fit(X_train, y_train)
+    # every candidate and both models share one scaler cache, the scaler
+    # is only fit once per fold (and per halving round)
+    memory = Memory(CACHE_DIR, verbose=0)
 
-    print(f"Best Gradient Boosting Accuracy: {gradient_boosting_grid.best_score_:.2%}")
-    print(f"Best Gradient Boosting Parameters: {gradient_boosting_grid.best_params_}")
+    searches = [
+        (
+            "random_forest",
+            RandomForestClassifier(random_state=42),
+            RANDOM_FOREST_PARAMETERS,
+            RANDOM_FOREST_DISTRIBUTIONS,
+        ),
+        (
+            "gradient_boosting",
+            GradientBoostingClassifier(random_state=42),
+            GRADIENT_BOOSTING_PARAMETERS,
+            GRADIENT_BOOSTING_DISTRIBUTIONS,
+        ),
+    ]
 
-    print("done evaluating")
+    for name, model, grid, distributions in searches:
+        print(f"Tuning {name} ({mode} search)...")
+        search = make_search(
+            mode,
+            build_pipeline(model, memory=memory),
+            grid,
+            distributions,
+            cv,
+            n_iter,
+            n_jobs,
+        )
 
-    best_rf_model = random_forest_grid.best_estimator_
-    random_forest_test_acc = best_rf_model.score(X_test, y_test)
+        start = time.perf_counter()
+        search.fit(X_train, y_train)
+        elapsed = time.perf_counter() - start
 
-    best_gb_model = gradient_boosting_grid.best_estimator_
-    gradient_boosting_test_acc = best_gb_model.score(X_test, y_test)
+        rows = candidate_rows(name, search, n_splits)
+        candidates.append(rows)
+
+        best_params = {
+            k.replace("model__", ""): v for k, v in search.best_params_.items()
+        }
+        test_acc = search.best_estimator_.score(X_test, y_test)
+        best_models[name] = (test_acc, search.best_estimator_)
+        summary["models"][name] = {
+            "best_cv_accuracy": float(search.best_score_),
+            "best_params": best_params,
+            "test_accuracy": float(test_acc),
+            "candidates": len(rows),
+            "search_seconds": elapsed,
+        }
+
+        print(f"Best {name} accuracy: {search.best_score_:.2%}")
+        print(f"Best {name} parameters: {best_params}")
+        print(f"{name} test acc : {test_acc:.2%}")
+        print(f"{name} search took {elapsed:.1f}s over {len(rows)} candidates")
+
+    print("done evaluating")
 
-    print(f"random forest test acc : {random_forest_test_acc:.2%}")
-    print(f"gradient boosting test acc : {gradient_boosting_test_acc:.2%}")
+    winner = max(best_models, key=lambda name: best_models[name][0])
+    summary["winner"] = winner
+    print(f"{winner.replace('_', ' ')} wins")
 
-    if random_forest_test_acc > gradient_boosting_test_acc:
-        print("random forest wins")
-    else:
-        print("gradient boosting wins")
+    report_name = mode if profile == DEFAULT_PROFILE else f"{mode}_{profile}"
+    write_report(report_name, pd.concat(candidates, ignore_index=True), summary)
+
+    if save:
+        # best_estimator_ is refit on the whole training split
+        save_model(best_models[winner][1], model_path(profile))
 
 
 if __name__ == "__main__":
-    optimize()
+    parser = argparse.ArgumentParser(description="Tune the song classifier")
+    parser.add_argument(
+        "--search",
+        choices=SEARCH_MODES,
+        default="halving",
+        help="hyperparameter search strategy (grid is the old exhaustive search)",
+    )
+    parser.add_argument(
+        "--n-iter",
+        type=int,
+        default=20,
+        help="candidates sampled per model in random search",
+    )
+    parser.add_argument("--folds", type=int, default=5, help="cross-validation folds")
+    parser.add_argument(
+        "--jobs", type=int, default=-1, help="parallel fits, -1 uses every core"
+    )
+    parser.add_argument(
+        "--save",
+        action="store_true",
+        help="write the winning pipeline to models/music_classifier.pkl "
+        "(music_classifier_<profile>.pkl for other profiles)",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default=DEFAULT_PROFILE,
+        help="train on this feature profile's store, see ingest_data --profile",
+    )
+    args = parser.parse_args()
+
+    optimize(
+        mode=args.search,
+        n_iter=args.n_iter,
+        n_splits=args.folds,
+        n_jobs=args.jobs,
+        save=args.save,
+        profile=args.profile,
+    )
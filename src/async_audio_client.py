@@ -0,0 +1,73 @@
+import asyncio
+import os
+import sys
+import weakref
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from audio_client import AudioClient
+
+
+class AsyncAudioClient:
+    def __init__(self, client=None, max_concurrency=8):
+        """
+        Asyncio front end for AudioClient.
+
+        Each call runs the blocking AudioClient method on a worker thread,
+        so it shares the client's pooled session, retries, rate limiter and
+        result shapes. A semaphore caps how many requests are in flight,
+        which lets a batch of N lookups cost roughly one round trip.
+
+        Args:
+            client (AudioClient): client to wrap, a new one is built if None
+            max_concurrency (int): requests allowed in flight at once
+        """
+        self.client = client if client is not None else AudioClient()
+        self.max_concurrency = max_concurrency
+        # asyncio primitives belong to one event loop, and Streamlit starts
+        # a fresh loop on every rerun
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    async def _run(self, func, *args, **kwargs):
+        async with self._semaphore():
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def search_tracks(self, query, limit=3):
+        """
+        Searches Deezer API for query
+        """
+        return await self._run(self.client.search_tracks, query, limit=limit)
+
+    async def get_track(self, track_id):
+        """
+        Fetch a single track by Deezer track ID, None on failure
+        """
+        return await self._run(self.client.get_track, track_id)
+
+    async def get_tracks(self, track_ids):
+        """
+        Fetch several tracks concurrently.
+
+        Returns a list aligned with track_ids, with None for missing IDs
+        and failed lookups.
+        """
+
+        async def lookup(track_id):
+            if track_id is None:
+                return None
+            return await self.get_track(track_id)
+
+        return await asyncio.gather(*(lookup(track_id) for track_id in track_ids))
+
+    async def download_preview(self, preview_url, track_id):
+        """
+        Downloads the audio preview for a given track, returns the file path
+        """
+        return await self._run(self.client.download_preview, preview_url, track_id)
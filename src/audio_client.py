@@ -1,44 +1,174 @@
+import io
 import os
+import sys
+import time
+import random
+import shutil
+import subprocess
 import requests
 import warnings
 import librosa
 import numpy as np
+from requests.adapters import HTTPAdapter
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(current_dir, "..")
+sys.path.append(current_dir)
+
+from feature_engine import (
+    DEFAULT_PROFILE,
+    FeatureEngine,
+    get_profile,
+    summarize_data,
+    vector_to_dict,
+)
+from catalog_store import CatalogStore
+from feature_cache import FeatureCache
+from streaming_extractor import extract_streaming
+from tracing import count, span, traced
 
 warnings.filterwarnings("ignore")
 
+# responses worth retrying: rate limited or a server-side hiccup
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# search results fetched for title re-ranking when fewer are asked for
+SEARCH_POOL = 10
+
+# librosa.load's default analysis rate, the full profile's
+SAMPLE_RATE = 22050
+
 
 class AudioClient:
-    def __init__(self, temp_directory="../data/temp"):
+    def __init__(
+        self,
+        temp_directory=os.path.join(root_dir, "data", "temp"),
+        feature_cache=None,
+        catalog_store=None,
+        in_memory=False,
+        connect_timeout=3.05,
+        read_timeout=10,
+        max_retries=3,
+        backoff=0.5,
+        rate_limiter=None,
+        pool_size=16,
+        profile=DEFAULT_PROFILE,
+        api_url="https://api.deezer.com",
+    ):
         """
         Initializes the AudioClient with a temporary directory for storing
         audio files
         Uses the Deezer Search API as the audio source.
+        Extracted features are kept in feature_cache (a FeatureCache),
+        the shared on-disk cache is used when none is given. Every extracted
+        track is also added to catalog_store (a CatalogStore), which is
+        never evicted and feeds the recommender.
+
+        All HTTP goes through one pooled keep-alive session. Requests that
+        fail with a connection error, 429 or 5xx are retried up to
+        max_retries times with jittered exponential backoff. If a
+        rate_limiter (TokenBucket) is given, every Deezer API call takes a
+        token from it first.
+
+        With in_memory=True, features_for_track streams previews into memory
+        and decodes them there, nothing is written to temp_directory.
+
+        profile names the feature profile (see feature_engine.PROFILES):
+        its sample rate and clip duration are used when decoding, and the
+        default cache keeps its features apart from other profiles'.
+
+        api_url is the root of the Deezer API, e.g. a local server in tests.
         """
-        self.base_url = "https://api.deezer.com/search"
+        self.api_url = api_url.rstrip("/")
+        self.base_url = f"{self.api_url}/search"
         self.temp_directory = temp_directory
+        self.in_memory = in_memory
+        self.profile = profile
+        settings = get_profile(profile)
+        self.sample_rate = settings["sample_rate"]
+        self.duration = settings["duration"]
+        self.feature_engine = FeatureEngine.from_profile(profile)
+        self.feature_cache = (
+            feature_cache
+            if feature_cache is not None
+            else FeatureCache(profile=profile)
+        )
+        self.catalog_store = (
+            catalog_store
+            if catalog_store is not None
+            else CatalogStore(profile=profile)
+        )
+
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _get(self, url, params=None, rate_limited=True, stream=False):
+        """
+        GET through the pooled session with retries on transient failures
+        Args:
+            url (str): the URL to fetch
+            params (dict): query parameters
+            rate_limited (bool): take a rate_limiter token first (API calls)
+            stream (bool): leave the body unread for iter_content
+        """
+        for attempt in range(self.max_retries + 1):
+            if rate_limited and self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            try:
+                with span("http.get"):
+                    response = self.session.get(
+                        url, params=params, timeout=self.timeout, stream=stream
+                    )
+            except (requests.ConnectionError, requests.Timeout):
+                count("http.connection_errors")
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff_delay(attempt))
+                continue
+
+            count(f"http.status.{response.status_code}")
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                count("http.retries")
+                retry_after = response.headers.get("Retry-After", "")
+                delay = (
+                    float(retry_after)
+                    if retry_after.isdigit()
+                    else self._backoff_delay(attempt)
+                )
+                time.sleep(delay)
+                continue
+
+            return response
 
-        if not os.path.exists(self.temp_directory):
-            os.makedirs(self.temp_directory)
+    def _backoff_delay(self, attempt):
+        # full jitter keeps parallel workers from retrying in lockstep
+        return random.uniform(0, self.backoff * (2**attempt))
 
     def summarize_data(self, x, prefix):
         """
         Compute mean, standard deviation, max and min for a data entry array
         """
-        return {
-            f"{prefix}_mean": float(np.mean(x)),
-            f"{prefix}_std": float(np.std(x)),
-            f"{prefix}_min": float(np.min(x)),
-            f"{prefix}_max": float(np.max(x)),
-        }
+        return summarize_data(x, prefix)
 
+    @traced("deezer.search")
     def search_tracks(self, query, limit=3):
         """
-        Searches Deezer API for query
+        Searches Deezer API for query and returns the limit results whose
+        titles share the most words with it. At least SEARCH_POOL results
+        are fetched, so small limits still get re-ranked.
         """
-        params = {"q": query, "limit": 10}
+        params = {"q": query, "limit": max(limit, SEARCH_POOL)}
 
         try:
-            response = requests.get(self.base_url, params=params, timeout=5)
+            response = self._get(self.base_url, params=params)
             response.raise_for_status()
             data = response.json()
 
@@ -71,6 +201,7 @@ class AudioClient:
             print(f"Error during Deezer search: {e}")
             return []
 
+    @traced("deezer.get_track")
     def get_track(self, track_id):
         """
         Fetch a single track by Deezer track ID.
@@ -78,8 +209,8 @@ class AudioClient:
         Returns a dict with keys similar to search_tracks items, or None on failure.
         """
         try:
-            url = f"https://api.deezer.com/track/{track_id}"
-            response = requests.get(url, timeout=5)
+            url = f"{self.api_url}/track/{track_id}"
+            response = self._get(url)
             response.raise_for_status()
             data = response.json()
             if not data or data.get("error"):
@@ -96,6 +227,53 @@ class AudioClient:
             print(f"Error fetching Deezer track {track_id}: {e}")
             return None
 
+    @traced("deezer.playlist")
+    def get_playlist_tracks(self, playlist, limit=100):
+        """
+        Fetch the tracks of a Deezer playlist.
+
+        Args:
+        playlist (str): playlist ID or a deezer.com playlist URL
+        limit (int): maximum number of tracks to return
+        Returns a list of dicts shaped like search_tracks items.
+        """
+        playlist_id = str(playlist).rstrip("/").split("/")[-1].split("?")[0]
+        url = f"{self.api_url}/playlist/{playlist_id}/tracks"
+        params = {"limit": min(limit, 100)}
+        tracks = []
+
+        try:
+            # the API pages results, follow "next" until we have enough
+            while url and len(tracks) < limit:
+                response = self._get(url, params=params)
+                response.raise_for_status()
+                data = response.json()
+                if data.get("error"):
+                    print(f"Error fetching Deezer playlist {playlist_id}: {data}")
+                    break
+
+                for item in data.get("data", []):
+                    tracks.append(
+                        {
+                            "trackId": item.get("id"),
+                            "trackName": item.get("title"),
+                            "artistName": (item.get("artist") or {}).get("name"),
+                            "artworkUrl100": (item.get("album") or {}).get(
+                                "cover_medium"
+                            ),
+                            "previewUrl": item.get("preview"),
+                        }
+                    )
+
+                # "next" already carries the paging query string
+                url = data.get("next")
+                params = None
+        except Exception as e:
+            print(f"Error fetching Deezer playlist {playlist_id}: {e}")
+
+        return tracks[:limit]
+
+    @traced("download_preview")
     def download_preview(self, preview_url, track_id):
         """
         Downloads the audio preview for a given track to /data/temp.
@@ -108,6 +286,7 @@ class AudioClient:
             print("No preview URL provided.")
             return None
 
+        os.makedirs(self.temp_directory, exist_ok=True)
         filename = os.path.join(self.temp_directory, f"{track_id}.m4a")
 
         # if track alr exists, return filename
@@ -115,7 +294,9 @@ class AudioClient:
             return filename
 
         try:
-            response = requests.get(preview_url)
+            # previews come from the CDN, which is not under the API quota
+            response = self._get(preview_url, rate_limited=False)
+            response.raise_for_status()
             with open(filename, "wb") as f:
                 f.write(response.content)
             return filename
@@ -123,106 +304,168 @@ class AudioClient:
             print(f"Error downloading preview: {e}")
             return None
 
-    def extract_features(self, file_path, duration=30):
-        """
-        Extracts Mel-Frequency Cepstral Coefficients (MFCCs) and tempo
-        from the audio file
+    @traced("download_preview")
+    def download_preview_bytes(self, preview_url):
         """
-        try:
-            # librosa.load decodes the audio
-            # then resamples it to 22050 Hz to analyze texture
-            # then mixes to mono
-            raw_waveform, sample_rate = librosa.load(file_path, duration=duration)
-
-            features = {}
-
-            # -- rhythm --
-            # find when notes start (onsets)
-            # this creates a graph of energy spikes over the sample
-            onset = librosa.onset.onset_strength(y=raw_waveform, sr=sample_rate)
+        Streams the audio preview into memory instead of /data/temp.
 
-            # finds potential tempos of the song
-            tempo = librosa.beat.tempo(onset_envelope=onset, sr=sample_rate)[0]
-            features["tempo"] = float(tempo)
-
-            beat_frames = librosa.beat.beat_track(onset_envelope=onset, sr=sample_rate)[
-                1
-            ]
+        Args:
+        preview_url (str): The URL of the audio preview.
+        Returns:
+        bytes: the encoded preview, or None on failure
+        """
+        if not preview_url:
+            print("No preview URL provided.")
+            return None
 
-            if len(beat_frames) > 1:
-                beat_times = librosa.frames_to_time(beat_frames, sr=sample_rate)
-                beat_intervals = np.diff(beat_times)
-                features.update(self.summarize_data(beat_intervals, "beat_interval"))
-            else:
-                features.update(
-                    {
-                        "beat_interval_mean": 0.0,
-                        "beat_interval_std": 0.0,
-                        "beat_interval_min": 0.0,
-                        "beat_interval_max": 0.0,
-                    }
-                )
+        try:
+            response = self._get(preview_url, rate_limited=False, stream=True)
+            response.raise_for_status()
+            buffer = io.BytesIO()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                buffer.write(chunk)
+            return buffer.getvalue()
+        except Exception as e:
+            print(f"Error downloading preview: {e}")
+            return None
 
-            # -- MFCCs and deltas --
-            # MFCCs (Mel-Frequency Cepstral Coefficients) describes the shape of the sound spectrum
-            mfcc = librosa.feature.mfcc(y=raw_waveform, sr=sample_rate, n_mfcc=13)
-            mfcc_delta = librosa.feature.delta(mfcc)
-            mfcc_delta_2 = librosa.feature.delta(mfcc, order=2)
-
-            for i in range(mfcc.shape[0]):
-                features.update(self.summarize_data(mfcc[i], f"mfcc_{i+1}"))
-                features.update(self.summarize_data(mfcc_delta[i], f"mfcc_delta_{i+1}"))
-                features.update(
-                    self.summarize_data(mfcc_delta_2[i], f"mfcc_delta_2_{i+1}")
-                )
+    @traced("decode")
+    def decode_audio(self, audio_bytes, duration=None):
+        """
+        Decodes an encoded clip held in memory to a mono float32 waveform
+        at the profile's sample rate, matching what librosa.load does for
+        a file. duration defaults to the profile's.
 
-            # -- spectral features --
-            spectral_centroid = librosa.feature.spectral_centroid(
-                y=raw_waveform, sr=sample_rate
-            )[0]
-            spectral_bandwidth = librosa.feature.spectral_bandwidth(
-                y=raw_waveform, sr=sample_rate
-            )[0]
-            spectral_rolloff = librosa.feature.spectral_rolloff(
-                y=raw_waveform, sr=sample_rate
-            )
-            spectral_contrast = librosa.feature.spectral_contrast(
-                y=raw_waveform, sr=sample_rate
+        libsndfile handles the MP3 previews Deezer serves. Anything it can't
+        read (AAC .m4a) is piped through ffmpeg, still without touching disk.
+        """
+        duration = duration or self.duration
+        try:
+            return librosa.load(
+                io.BytesIO(audio_bytes), sr=self.sample_rate, duration=duration
             )
+        except Exception:
+            if shutil.which("ffmpeg") is None:
+                raise
+
+        decoded = subprocess.run(
+            [
+                "ffmpeg",
+                "-loglevel",
+                "error",
+                "-i",
+                "pipe:0",
+                "-t",
+                str(duration),
+                "-f",
+                "f32le",
+                "-ac",
+                "1",
+                "-ar",
+                str(self.sample_rate),
+                "pipe:1",
+            ],
+            input=audio_bytes,
+            capture_output=True,
+            check=True,
+        )
+        return np.frombuffer(decoded.stdout, dtype=np.float32), self.sample_rate
+
+    def features_for_track(self, track):
+        """
+        Returns the features of a track, only touching audio on a cache miss.
 
-            features.update(self.summarize_data(spectral_centroid, "spectral_centriod"))
-            features.update(
-                self.summarize_data(spectral_bandwidth, "spectral_bandwidth")
-            )
-            features.update(self.summarize_data(spectral_rolloff, "spectral_rolloff"))
+        Args:
+        track (dict): a track as returned by search_tracks / get_track
+        """
+        track_id = track.get("trackId")
+        features = self.feature_cache.get(track_id)
+        if features is not None:
+            count("feature_cache.hits")
+            return features
+        count("feature_cache.misses")
 
-            for i in range(spectral_contrast.shape[0]):
-                features.update(
-                    self.summarize_data(
-                        spectral_contrast[i], f"spectral_contrast_{i+1}"
-                    )
-                )
+        if self.in_memory:
+            audio_bytes = self.download_preview_bytes(track.get("previewUrl"))
+            if not audio_bytes:
+                return None
+            features = self.extract_features_from_bytes(audio_bytes)
+        else:
+            path = self.download_preview(track.get("previewUrl"), track_id)
+            if not path:
+                return None
+            features = self.extract_features(path)
 
-            # -- harmonics and pitch --
-            chroma = librosa.feature.chroma_stft(y=raw_waveform, sr=sample_rate)
-            for i in range(chroma.shape[0]):
-                features.update(self.summarize_data(chroma[i], f"chroma_{i+1}"))
+        if features:
+            self.cache_features(track, features)
+        return features
 
-            # -- energy and dynamics --
-            root_mean_square_value = librosa.feature.rms(y=raw_waveform)[0]
-            zero_crossing_rate = librosa.feature.zero_crossing_rate(y=raw_waveform)[0]
+    def cache_features(self, track, features):
+        """
+        Stores extracted features for a track along with its display info,
+        in the cache and the recommendation catalog
+        """
+        meta = {
+            "trackName": track.get("trackName"),
+            "artistName": track.get("artistName"),
+        }
+        self.feature_cache.put(track.get("trackId"), features, meta=meta)
+        self.catalog_store.put(track.get("trackId"), features, meta=meta)
 
-            features.update(self.summarize_data(root_mean_square_value, "rms"))
-            features.update(self.summarize_data(zero_crossing_rate, "zcr"))
+    def extract_features(self, file_path, duration=None, delete=True):
+        """
+        Extracts Mel-Frequency Cepstral Coefficients (MFCCs) and tempo
+        from the audio file. Downloaded previews are deleted afterwards,
+        pass delete=False for files that aren't ours, e.g. a local library.
+        """
+        try:
+            # librosa.load decodes the audio
+            # then resamples it to the profile's rate (22050 Hz for full)
+            # then mixes to mono
+            with span("decode"):
+                raw_waveform, sample_rate = librosa.load(
+                    file_path, sr=self.sample_rate, duration=duration or self.duration
+                )
 
-            return features
+            return self.feature_engine.extract(raw_waveform, sample_rate)
         except Exception as e:
             print(f"Error extracting features from {file_path}: {e}")
             return None
         finally:
-            if os.path.exists(file_path):
+            if delete and os.path.exists(file_path):
                 os.remove(file_path)
 
+    def extract_features_from_bytes(self, audio_bytes, duration=None):
+        """
+        Same features as extract_features, for a preview held in memory
+        """
+        try:
+            raw_waveform, sample_rate = self.decode_audio(audio_bytes, duration)
+            return self.feature_engine.extract(raw_waveform, sample_rate)
+        except Exception as e:
+            print(f"Error extracting features from in-memory audio: {e}")
+            return None
+
+    def extract_features_streaming(self, file_path, duration=None, block_seconds=10.0):
+        """
+        Same features as extract_features for audio of any length (full
+        tracks, DJ mixes), decoded and analysed block by block so memory
+        stays flat. The whole file is analysed unless duration is given,
+        and unlike extract_features the file is left in place.
+        """
+        try:
+            vector = extract_streaming(
+                self.feature_engine,
+                file_path,
+                self.sample_rate,
+                block_seconds=block_seconds,
+                duration=duration,
+            )
+            return vector_to_dict(vector, self.feature_engine.columns)
+        except Exception as e:
+            print(f"Error streaming features from {file_path}: {e}")
+            return None
+
 
 if __name__ == "__main__":
     client = AudioClient()
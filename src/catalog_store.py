@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from feature_engine import (
+    DEFAULT_PROFILE,
+    dict_to_vector,
+    feature_version,
+    profile_columns,
+)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(current_dir, "..")
+
+DEFAULT_CATALOG_PATH = os.path.join(root_dir, "data", "catalog", "catalog.sqlite")
+
+
+class CatalogStore:
+    def __init__(self, path=DEFAULT_CATALOG_PATH, profile=DEFAULT_PROFILE):
+        """
+        Unbounded store of every analysed track's feature vector, the
+        candidates the recommender ranks.
+
+        Unlike FeatureCache nothing is ever evicted, so the catalog doesn't
+        shrink as the cache turns over. Vectors are stored as float32 blobs
+        laid out as the profile's columns and keyed by track ID and
+        extractor version, so profiles share the file but not each other's
+        rows.
+        """
+        self.path = path
+        self.profile = profile
+        self.columns = profile_columns(profile)
+        self.version = feature_version(profile)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tracks (
+                    track_id INTEGER NOT NULL,
+                    version TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    track_name TEXT,
+                    artist_name TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (track_id, version)
+                )
+                """
+            )
+            # stamp() runs on every page rerun, this keeps it off the table
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS tracks_stamp "
+                "ON tracks (version, updated_at)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def put(self, track_id, features, meta=None):
+        """
+        Stores (or replaces) a track's vector
+        Args:
+            track_id: Deezer track ID
+            features (dict): output of AudioClient.extract_features
+            meta (dict): optional trackName / artistName
+        """
+        if track_id is None or not features:
+            return
+
+        meta = meta or {}
+        try:
+            vector = dict_to_vector(features, self.columns)
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        int(track_id),
+                        self.version,
+                        vector.tobytes(),
+                        meta.get("trackName"),
+                        meta.get("artistName"),
+                        time.time(),
+                    ),
+                )
+        except (KeyError, ValueError) as e:
+            print(f"Skipping catalog entry for {track_id}: {e}")
+        except sqlite3.Error as e:
+            print(f"Error writing catalog: {e}")
+
+    def stamp(self):
+        """
+        Changes whenever a row of the current version is added or
+        replaced: (version, row count, latest updated_at)
+        """
+        with self._connect() as conn:
+            n, latest = conn.execute(
+                "SELECT COUNT(*), MAX(updated_at) FROM tracks WHERE version = ?",
+                (self.version,),
+            ).fetchone()
+        return self.version, n, latest
+
+    def load(self):
+        """
+        Every row of the current version
+        Returns:
+            (np.ndarray, np.ndarray, list): int64 track IDs, an (n, columns)
+            float32 matrix and display info per row
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT track_id, vector, track_name, artist_name FROM tracks "
+                "WHERE version = ? ORDER BY track_id",
+                (self.version,),
+            ).fetchall()
+
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        X = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32)
+        info = [{"trackName": row[2], "artistName": row[3]} for row in rows]
+        return ids, X.reshape(-1, len(self.columns)), info
+
+    def __len__(self):
+        return self.stamp()[1]
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from feature_engine import DEFAULT_PROFILE, feature_version
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(current_dir, "..")
+
+DEFAULT_CACHE_PATH = os.path.join(root_dir, "data", "cache", "features.sqlite")
+
+
+class FeatureCache:
+    def __init__(
+        self,
+        path=DEFAULT_CACHE_PATH,
+        max_bytes=256 * 1024 * 1024,
+        profile=DEFAULT_PROFILE,
+    ):
+        """
+        On-disk feature store keyed by Deezer track ID and extractor version.
+        Each feature profile other than full gets its own version, so
+        profiles share the file but never each other's entries.
+
+        Entries live in a single SQLite file so the Streamlit pages and the
+        ingestion worker processes can share it safely. Once the stored
+        payloads exceed max_bytes, the least recently used entries are
+        evicted. The payload total is kept in the one-row cache_meta table
+        and updated in the same transaction as each write, so a put never
+        has to sum the whole table.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.profile = profile
+        self.version = feature_version(profile)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS features (
+                    key TEXT PRIMARY KEY,
+                    track_id TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    meta TEXT,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS features_lru ON features (last_access)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_meta (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    total_bytes INTEGER NOT NULL
+                )
+                """
+            )
+            # caches from before the running total start from a full count
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_meta "
+                "SELECT 0, COALESCE(SUM(size), 0) FROM features"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # a fresh connection per call keeps the cache usable across threads
+        # and processes, sqlite handles the locking
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def key(self, track_id):
+        """
+        Content address of a track's features under the current extractor
+        """
+        return hashlib.sha256(f"{self.version}:{track_id}".encode()).hexdigest()
+
+    def get(self, track_id):
+        """
+        Returns the cached feature dict for track_id, or None on a miss
+        """
+        if track_id is None:
+            return None
+
+        key = self.key(track_id)
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT payload FROM features WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE features SET last_access = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            print(f"Error reading feature cache: {e}")
+            return None
+
+    def put(self, track_id, features, meta=None):
+        """
+        Stores the feature dict for track_id, then evicts down to max_bytes
+        Args:
+            track_id: Deezer track ID
+            features (dict): output of AudioClient.extract_features
+            meta (dict): optional track info (name, artist, ...)
+        """
+        if track_id is None or not features:
+            return
+
+        payload = json.dumps(features)
+        meta_payload = json.dumps(meta) if meta else None
+        size = len(payload) + len(meta_payload or "")
+
+        key = self.key(track_id)
+        try:
+            with self._connect() as conn:
+                # take the write lock up front, so the size being replaced
+                # can't change before the total is adjusted
+                conn.execute("BEGIN IMMEDIATE")
+                old = conn.execute(
+                    "SELECT size FROM features WHERE key = ?", (key,)
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        str(track_id),
+                        self.version,
+                        payload,
+                        meta_payload,
+                        size,
+                        time.time(),
+                    ),
+                )
+                self._add_bytes(conn, size - (old[0] if old else 0))
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Error writing feature cache: {e}")
+
+    def items(self, batch_size=1000):
+        """
+        Iterates every entry of the current extractor version, without
+        touching last_access
+        Yields:
+            (track_id, features, meta): track_id as stored (a string), the
+            feature dict and the meta dict (or None)
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    "SELECT track_id, payload, meta FROM features WHERE version = ?",
+                    (self.version,),
+                )
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for track_id, payload, meta in rows:
+                        yield track_id, json.loads(payload), (
+                            json.loads(meta) if meta else None
+                        )
+        except sqlite3.Error as e:
+            print(f"Error reading feature cache: {e}")
+
+    def _add_bytes(self, conn, delta):
+        conn.execute(
+            "UPDATE cache_meta SET total_bytes = total_bytes + ? WHERE id = 0",
+            (delta,),
+        )
+
+    def total_bytes(self):
+        """
+        Size of every stored payload, as tracked in cache_meta
+        """
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT total_bytes FROM cache_meta WHERE id = 0"
+            ).fetchone()[0]
+
+    def _evict(self, conn):
+        total = conn.execute(
+            "SELECT total_bytes FROM cache_meta WHERE id = 0"
+        ).fetchone()
+        excess = total[0] - self.max_bytes
+        if excess <= 0:
+            return
+
+        # oldest first until we are back under the bound
+        stale = []
+        freed = 0
+        for key, size in conn.execute(
+            "SELECT key, size FROM features ORDER BY last_access ASC"
+        ):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM features WHERE key = ?", stale)
+        self._add_bytes(conn, -freed)
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM features").fetchone()[0]
@@ -0,0 +1,437 @@
+import hashlib
+import os
+import sys
+
+import librosa
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from tracing import span, traced
+
+# bump whenever a change here alters the extracted values or columns,
+# cached features from older versions are then ignored
+FEATURE_VERSION = "2"
+
+# bump whenever FEATURE_COLUMNS changes order or content
+SCHEMA_VERSION = "1"
+
+STATS = ("mean", "std", "min", "max")
+
+N_MFCC = 13
+N_SPECTRAL_CONTRAST = 7
+N_CHROMA = 12
+
+# feature groups a profile can switch on, in column order
+FEATURE_GROUPS = (
+    "rhythm",
+    "mfcc",
+    "mfcc_deltas",
+    "spectral",
+    "contrast",
+    "chroma",
+    "energy",
+)
+
+# named extraction profiles. "full" is what ingestion and the saved models
+# use, the lighter ones trade accuracy for latency when scoring
+# interactively and need a model trained on their own schema
+DEFAULT_PROFILE = "full"
+PROFILES = {
+    "full": {
+        "sample_rate": 22050,
+        "duration": 30,
+        "n_fft": 2048,
+        "hop_length": 512,
+        "n_mfcc": N_MFCC,
+        "groups": FEATURE_GROUPS,
+    },
+    # half the rate (same frequency resolution) and half the clip, no beat
+    # tracking or chroma. spectral contrast's top band is above 5.5 kHz
+    "fast": {
+        "sample_rate": 11025,
+        "duration": 15,
+        "n_fft": 1024,
+        "hop_length": 512,
+        "n_mfcc": N_MFCC,
+        "groups": ("mfcc", "mfcc_deltas", "spectral", "energy"),
+    },
+    # timbre and loudness of a short excerpt only
+    "minimal": {
+        "sample_rate": 11025,
+        "duration": 10,
+        "n_fft": 1024,
+        "hop_length": 1024,
+        "n_mfcc": N_MFCC,
+        "groups": ("mfcc", "spectral", "energy"),
+    },
+}
+
+
+def summarize_data(x, prefix):
+    """
+    Compute mean, standard deviation, max and min for a data entry array
+    """
+    return {
+        f"{prefix}_mean": float(np.mean(x)),
+        f"{prefix}_std": float(np.std(x)),
+        f"{prefix}_min": float(np.min(x)),
+        f"{prefix}_max": float(np.max(x)),
+    }
+
+
+def summarize_matrix(matrix):
+    """
+    Vectorized summarize_data: reduces every row of a (rows, frames)
+    matrix along the time axis in one pass
+    Returns:
+        np.ndarray: (rows, 4) array of mean, std, min, max
+    """
+    matrix = np.atleast_2d(matrix)
+    return np.stack(
+        [
+            matrix.mean(axis=1),
+            matrix.std(axis=1),
+            matrix.min(axis=1),
+            matrix.max(axis=1),
+        ],
+        axis=1,
+    )
+
+
+def stat_columns(prefix):
+    return [f"{prefix}_{stat}" for stat in STATS]
+
+
+def build_feature_columns(n_mfcc=N_MFCC, groups=FEATURE_GROUPS):
+    """
+    The fixed column layout of a feature vector, in extraction order
+    Args:
+        n_mfcc (int): number of MFCC coefficients
+        groups (tuple): feature groups to include, see FEATURE_GROUPS
+    """
+    columns = []
+    if "rhythm" in groups:
+        columns += ["tempo"] + stat_columns("beat_interval")
+    if "mfcc" in groups:
+        for i in range(1, n_mfcc + 1):
+            columns += stat_columns(f"mfcc_{i}")
+            if "mfcc_deltas" in groups:
+                columns += stat_columns(f"mfcc_delta_{i}")
+                columns += stat_columns(f"mfcc_delta_2_{i}")
+    if "spectral" in groups:
+        columns += stat_columns("spectral_centriod")
+        columns += stat_columns("spectral_bandwidth")
+        columns += stat_columns("spectral_rolloff")
+    if "contrast" in groups:
+        for i in range(1, N_SPECTRAL_CONTRAST + 1):
+            columns += stat_columns(f"spectral_contrast_{i}")
+    if "chroma" in groups:
+        for i in range(1, N_CHROMA + 1):
+            columns += stat_columns(f"chroma_{i}")
+    if "energy" in groups:
+        columns += stat_columns("rms")
+        columns += stat_columns("zcr")
+    return columns
+
+
+FEATURE_COLUMNS = build_feature_columns()
+
+
+def get_profile(name=DEFAULT_PROFILE):
+    """
+    Settings of a named feature profile, see PROFILES
+    """
+    if name not in PROFILES:
+        raise ValueError(
+            f"Unknown feature profile {name!r}, expected one of {sorted(PROFILES)}"
+        )
+    return PROFILES[name]
+
+
+def feature_version(profile=DEFAULT_PROFILE):
+    """
+    Version stored with cached features, so neither older extractors' nor
+    other profiles' entries are ever served
+    """
+    if profile == DEFAULT_PROFILE:
+        return FEATURE_VERSION
+    return f"{FEATURE_VERSION}-{profile}"
+
+
+def profile_columns(name=DEFAULT_PROFILE):
+    """
+    Column layout of the vectors a profile extracts
+    """
+    profile = get_profile(name)
+    return build_feature_columns(profile["n_mfcc"], profile["groups"])
+
+
+def schema_hash(columns=FEATURE_COLUMNS, profile=DEFAULT_PROFILE):
+    """
+    Short fingerprint of a column layout, stored alongside trained models
+    so they are never fed vectors from a different schema.
+
+    Profiles other than full also hash their sample rate, duration and
+    STFT settings: those change the values even when the columns match.
+    """
+    layout = f"{SCHEMA_VERSION}:{','.join(columns)}"
+    if profile != DEFAULT_PROFILE:
+        settings = get_profile(profile)
+        layout += ":" + ",".join(
+            f"{key}={settings[key]}"
+            for key in ("sample_rate", "duration", "n_fft", "hop_length")
+        )
+    return hashlib.sha256(layout.encode()).hexdigest()[:16]
+
+
+def vector_to_dict(vector, columns=FEATURE_COLUMNS):
+    """
+    Dict view of a feature vector, in the shape extract_features returns
+    """
+    return dict(zip(columns, vector.tolist()))
+
+
+def dict_to_vector(features, columns=FEATURE_COLUMNS):
+    """
+    Lays a feature dict out as a float32 vector in schema order
+    """
+    return np.array([features[col] for col in columns], dtype=np.float32)
+
+
+class FeatureEngine:
+    def __init__(
+        self, n_fft=2048, hop_length=512, n_mfcc=N_MFCC, groups=FEATURE_GROUPS
+    ):
+        """
+        Derives every feature of a clip from one shared STFT.
+
+        The magnitude spectrogram feeds the spectral features, its square
+        feeds chroma and the mel filterbank, and the log-mel spectrogram
+        feeds both the MFCCs and the onset envelope. The STFT parameters
+        are librosa's defaults, so the output matches calling each
+        librosa.feature function on the raw waveform.
+
+        Statistics are written straight into a preallocated float32
+        vector laid out as self.columns. Feature groups left out of groups
+        are neither computed nor given columns.
+        """
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mfcc = n_mfcc
+        self.groups = frozenset(groups)
+
+        self.columns = build_feature_columns(n_mfcc, groups)
+        position = {col: i for i, col in enumerate(self.columns)}
+
+        def block(prefixes):
+            # (rows, 4) positions of each row's mean/std/min/max
+            return np.array(
+                [[position[col] for col in stat_columns(p)] for p in prefixes]
+            )
+
+        mfcc_rows = range(1, n_mfcc + 1)
+        blocks = {
+            "beat_interval": ["beat_interval"],
+            "mfcc": [f"mfcc_{i}" for i in mfcc_rows],
+            "mfcc_delta": [f"mfcc_delta_{i}" for i in mfcc_rows],
+            "mfcc_delta_2": [f"mfcc_delta_2_{i}" for i in mfcc_rows],
+            "spectral_centriod": ["spectral_centriod"],
+            "spectral_bandwidth": ["spectral_bandwidth"],
+            "spectral_rolloff": ["spectral_rolloff"],
+            "spectral_contrast": [
+                f"spectral_contrast_{i}" for i in range(1, N_SPECTRAL_CONTRAST + 1)
+            ],
+            "chroma": [f"chroma_{i}" for i in range(1, N_CHROMA + 1)],
+            "rms": ["rms"],
+            "zcr": ["zcr"],
+        }
+        # groups the engine leaves out have no columns
+        self.layout = {
+            name: block(prefixes)
+            for name, prefixes in blocks.items()
+            if f"{prefixes[0]}_mean" in position
+        }
+        self.tempo_index = position.get("tempo")
+
+    @classmethod
+    def from_profile(cls, name=DEFAULT_PROFILE):
+        """
+        Engine for a named feature profile. The profile's sample rate and
+        duration are applied when decoding, see AudioClient.
+        """
+        profile = get_profile(name)
+        return cls(
+            n_fft=profile["n_fft"],
+            hop_length=profile["hop_length"],
+            n_mfcc=profile["n_mfcc"],
+            groups=profile["groups"],
+        )
+
+    def analyze_rhythm(self, onset, sample_rate):
+        """
+        Tempo and beat frames of an onset envelope from one beat_track call.
+        beat_track estimates the tempo exactly as librosa.beat.tempo does
+        before it tracks the beats, so asking for both separately ran the
+        tempogram twice.
+        Returns:
+            tuple: (tempo in BPM, beat frame indices)
+        """
+        tempo, beat_frames = librosa.beat.beat_track(
+            onset_envelope=onset, sr=sample_rate, hop_length=self.hop_length
+        )
+        if not onset.any():
+            # beat_track reports 0 BPM for an envelope without onsets, where
+            # tempo() still returns the peak of its prior
+            tempo = librosa.beat.tempo(
+                onset_envelope=onset, sr=sample_rate, hop_length=self.hop_length
+            )
+        return np.atleast_1d(tempo)[0], beat_frames
+
+    def extract(self, raw_waveform, sample_rate):
+        """
+        Computes the feature dict for a decoded mono waveform
+        Args:
+            raw_waveform (np.ndarray): mono audio samples
+            sample_rate (int): sample rate of raw_waveform
+        Returns:
+            dict: feature name -> float
+        """
+        vector = self.extract_vector(raw_waveform, sample_rate)
+        return vector_to_dict(vector, self.columns)
+
+    @traced("extract")
+    def extract_vector(self, raw_waveform, sample_rate):
+        """
+        Computes the float32 feature vector for a decoded mono waveform,
+        laid out as self.columns
+        """
+        vector = np.zeros(len(self.columns), dtype=np.float32)
+
+        def write(name, matrix):
+            vector[self.layout[name]] = summarize_matrix(matrix)
+
+        # -- shared spectrograms --
+        with span("extract.stft"):
+            # one STFT per clip, every spectral feature below reuses it
+            magnitude = np.abs(
+                librosa.stft(raw_waveform, n_fft=self.n_fft, hop_length=self.hop_length)
+            )
+            power = magnitude**2
+            mel = librosa.feature.melspectrogram(
+                S=power, sr=sample_rate, n_fft=self.n_fft, hop_length=self.hop_length
+            )
+            log_mel = librosa.power_to_db(mel)
+
+        # -- rhythm --
+        if "rhythm" in self.groups:
+            with span("extract.rhythm"):
+                # find when notes start (onsets)
+                # this creates a graph of energy spikes over the sample
+                onset = librosa.onset.onset_strength(
+                    S=log_mel,
+                    sr=sample_rate,
+                    n_fft=self.n_fft,
+                    hop_length=self.hop_length,
+                )
+
+                # tempo and beat positions from a single tracking pass
+                tempo, beat_frames = self.analyze_rhythm(onset, sample_rate)
+                vector[self.tempo_index] = tempo
+
+                # fewer than two beats leaves the beat_interval stats at zero
+                if len(beat_frames) > 1:
+                    beat_times = librosa.frames_to_time(
+                        beat_frames, sr=sample_rate, hop_length=self.hop_length
+                    )
+                    write("beat_interval", np.diff(beat_times))
+
+        # -- MFCCs and deltas --
+        if "mfcc" in self.groups:
+            with span("extract.mfcc"):
+                # MFCCs (Mel-Frequency Cepstral Coefficients) describes the shape of the sound spectrum
+                mfcc = librosa.feature.mfcc(S=log_mel, n_mfcc=self.n_mfcc)
+                write("mfcc", mfcc)
+                if "mfcc_deltas" in self.groups:
+                    write("mfcc_delta", librosa.feature.delta(mfcc))
+                    write("mfcc_delta_2", librosa.feature.delta(mfcc, order=2))
+
+        # -- spectral features --
+        if "spectral" in self.groups:
+            with span("extract.spectral"):
+                spectral_centroid = librosa.feature.spectral_centroid(
+                    S=magnitude,
+                    sr=sample_rate,
+                    n_fft=self.n_fft,
+                    hop_length=self.hop_length,
+                )
+                write("spectral_centriod", spectral_centroid)
+                # bandwidth is measured around the centroid, so hand it over
+                write(
+                    "spectral_bandwidth",
+                    librosa.feature.spectral_bandwidth(
+                        S=magnitude,
+                        sr=sample_rate,
+                        n_fft=self.n_fft,
+                        hop_length=self.hop_length,
+                        centroid=spectral_centroid,
+                    ),
+                )
+                write(
+                    "spectral_rolloff",
+                    librosa.feature.spectral_rolloff(
+                        S=magnitude,
+                        sr=sample_rate,
+                        n_fft=self.n_fft,
+                        hop_length=self.hop_length,
+                    ),
+                )
+
+        if "contrast" in self.groups:
+            with span("extract.contrast"):
+                write(
+                    "spectral_contrast",
+                    librosa.feature.spectral_contrast(
+                        S=magnitude,
+                        sr=sample_rate,
+                        n_fft=self.n_fft,
+                        hop_length=self.hop_length,
+                    ),
+                )
+
+        # -- harmonics and pitch --
+        if "chroma" in self.groups:
+            with span("extract.chroma"):
+                write(
+                    "chroma",
+                    librosa.feature.chroma_stft(
+                        S=power,
+                        sr=sample_rate,
+                        n_fft=self.n_fft,
+                        hop_length=self.hop_length,
+                    ),
+                )
+
+        # -- energy and dynamics --
+        if "energy" in self.groups:
+            with span("extract.energy"):
+                # rms and zcr are framed in the time domain, they never used the STFT
+                write(
+                    "rms",
+                    librosa.feature.rms(
+                        y=raw_waveform,
+                        frame_length=self.n_fft,
+                        hop_length=self.hop_length,
+                    ),
+                )
+                write(
+                    "zcr",
+                    librosa.feature.zero_crossing_rate(
+                        y=raw_waveform,
+                        frame_length=self.n_fft,
+                        hop_length=self.hop_length,
+                    ),
+                )
+
+        return vector
@@ -0,0 +1,98 @@
+from collections import deque
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+CLASSES = np.array([0, 1])
+
+
+class IncrementalModel:
+    def __init__(
+        self,
+        drift_window=10,
+        drift_threshold=0.5,
+        refit_epochs=20,
+        alpha=1e-3,
+        random_state=42,
+    ):
+        """
+        Online learner for per-label updates while a profile is being built.
+
+        A StandardScaler and a logistic SGDClassifier are both updated with
+        partial_fit, so learning one new label takes milliseconds. Each new
+        row is predicted before it is learned. When the rolling error rate
+        of those predictions over the last drift_window labels goes above
+        drift_threshold, update() asks for a full refit.
+
+        pipeline has the same interface as the one returned by
+        train_model_in_memory, so it can be used for scoring as is.
+        """
+        self.drift_window = drift_window
+        self.drift_threshold = drift_threshold
+        self.refit_epochs = refit_epochs
+        self.alpha = alpha
+        self.random_state = random_state
+
+        self.scaler = StandardScaler()
+        self.model = self._new_model()
+        self.errors = deque(maxlen=drift_window)
+        self.n_seen = 0
+
+    def _new_model(self):
+        return SGDClassifier(
+            loss="log_loss", alpha=self.alpha, random_state=self.random_state
+        )
+
+    @property
+    def pipeline(self):
+        """
+        The fitted scaler and model as one scaler + classifier pipeline
+        """
+        return Pipeline([("scaler", self.scaler), ("model", self.model)])
+
+    @property
+    def is_fitted(self):
+        return hasattr(self.model, "coef_")
+
+    def fit(self, X, y):
+        """
+        Full refit from scratch on every labelled row
+        """
+        self.scaler = StandardScaler().fit(X)
+        X_scaled = self.scaler.transform(X)
+
+        # partial_fit epochs instead of fit(), fit() refuses a single class
+        # and the first few labels are often all likes
+        self.model = self._new_model()
+        for _ in range(self.refit_epochs):
+            self.model.partial_fit(X_scaled, y, classes=CLASSES)
+
+        self.errors.clear()
+        self.n_seen = len(X)
+
+    def update(self, X, y):
+        """
+        Learns from newly labelled rows
+        Returns:
+            bool: True when a full refit is due (not fitted yet, or drift)
+        """
+        if not self.is_fitted:
+            return True
+
+        y = np.asarray(y)
+        # test-then-train: score the new rows before learning them
+        predicted = self.model.predict(self.scaler.transform(X))
+        self.errors.extend(predicted != y)
+
+        self.scaler.partial_fit(X)
+        self.model.partial_fit(self.scaler.transform(X), y)
+        self.n_seen += len(X)
+
+        return self.drift_detected()
+
+    def drift_detected(self):
+        if len(self.errors) < self.drift_window:
+            return False
+        return float(np.mean(self.errors)) > self.drift_threshold
@@ -1,91 +1,217 @@
-import sys
 import os
-import pandas as pd
+import argparse
 import time
-import random
 
 from audio_client import AudioClient
-
-LIKED_ARTISTS = [
-    "Playboi Carti",
-    "Drake",
-    "21 Savage",
-    "Key Glock",
-    "Anirudh Ravichander",
-    "Yeat",
-    "Lil Uzi Vert",
-    "Santhosh Narayanan",
-    "Lil Tecca",
-    "Hiphop Tamizha",
-]
-
-DISLIKED_ARTISTS = [
-    "Nickelback",
-    "Rebecca Black",
-    "Limp Bizkit",
-    "Insane Clown Posse",
-    "Hanson",
-    "Celine Dion",
-    "Rebecca Black",
-    "Johann Sebastian Bach",
-    "William Basinski",
-]
-
-client = AudioClient()
-
-
-def ingest_data():
-    dataset = []
+from ingest_pipeline import IngestPipeline
+from job_spec import fetch_source, in_shard, load_job_spec, parse_shard, unique_sources
+from rate_limiter import TokenBucket
+from feature_engine import DEFAULT_PROFILE, PROFILES
+from training_store import TrainingStore, store_path
+from tracing import count, span
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(current_dir, "..")
+
+DEFAULT_SPEC_PATH = os.path.join(root_dir, "jobs", "default.json")
+
+# Deezer allows 50 API requests per 5 seconds
+DEEZER_REQUESTS_PER_SECOND = 10
+
+
+def build_client(profile=DEFAULT_PROFILE):
+    """
+    The client ingestion runs with: in-memory decoding, rate limited to
+    Deezer's quota
+    """
+    return AudioClient(
+        in_memory=True,
+        rate_limiter=TokenBucket(DEEZER_REQUESTS_PER_SECOND),
+        profile=profile,
+    )
+
+
+def ingest_data(
+    spec_path=DEFAULT_SPEC_PATH,
+    output=None,
+    workers=1,
+    resume=True,
+    shard=None,
+    client=None,
+    profile=DEFAULT_PROFILE,
+):
+    """
+    Builds a training store from a job spec.
+
+    Rows are checkpointed into the store as they are produced and every
+    stored track ID is skipped, so an interrupted run picks up where it
+    stopped. Tracks that failed are retried on the next run.
+    Args:
+        spec_path (str): JSON or YAML job spec, see job_spec.load_job_spec
+        output (str): store directory, overrides the spec's "output"
+        workers (int): feature extraction processes, 1 keeps the serial loop
+        resume (bool): keep the rows of earlier runs, False starts over
+        shard (tuple): (index, count), only ingest this shard's tracks
+        client (AudioClient): defaults to build_client(profile)
+        profile (str): feature profile to extract, the client's if given
+    """
+    spec = load_job_spec(spec_path)
+    jobs = unique_sources(spec["sources"])
+    client = client or build_client(profile)
+
+    store = TrainingStore(
+        output or spec["output"] or store_path(client.profile),
+        overwrite=not resume,
+        profile=client.profile,
+    )
+    done_ids = store.track_ids()
+    if done_ids:
+        print(f"Resuming: {len(done_ids)} tracks already stored")
+    if shard:
+        print(f"Ingesting shard {shard[0]} of {shard[1]}")
 
     print("--- starting data ingestion ---")
-
-    liked_artists = process_artists(LIKED_ARTISTS, 1)
-    disliked_artists = process_artists(DISLIKED_ARTISTS, 0)
-
-    dataset.extend(liked_artists)
-    dataset.extend(disliked_artists)
-
-    if dataset:
-        os.makedirs("../data/raw", exist_ok=True)
-        output_path = "../data/raw/training_data.csv"
-
-        df = pd.DataFrame(data=dataset)
-        df.to_csv(output_path, index=False)
-
-        print(f"Success! Saved {len(df)} songs to {output_path}")
+    start = time.perf_counter()
+
+    try:
+        with span("ingest", workers=workers):
+            if workers > 1:
+                pipeline = IngestPipeline(client, workers=workers)
+                produced = pipeline.run(jobs, store.add, skip_ids=done_ids, shard=shard)
+            else:
+                produced = process_sources(client, jobs, store.add, done_ids, shard)
+
+                elapsed = time.perf_counter() - start
+                print(
+                    f"\nProcessed {produced} tracks in {elapsed:.1f}s "
+                    f"({produced / elapsed:.2f} tracks/sec, 1 worker)"
+                )
+    finally:
+        # also on Ctrl-C, so the rows since the last checkpoint are kept and
+        # the run's checkpoint chunks are compacted
+        store.flush()
+
+    if len(store):
+        print(f"Success! Saved {produced} new songs, {len(store)} in {store.path}")
     else:
         print("Dataset does not exist")
 
 
-def process_artists(artist_list, label):
-    dataset = []
-    for artist in artist_list:
-        print(f"\n Searching for {artist}")
-        tracks = client.search_tracks(artist, limit=15)
+def process_sources(client, jobs, on_row, done_ids=(), shard=None):
+    """
+    Serial ingestion loop
+    Args:
+        client (AudioClient): used for searches, downloads and features
+        jobs (list): source dicts from job_spec.load_job_spec
+        on_row (callable): receives each finished row
+        done_ids (set): track IDs to skip
+        shard (tuple): (index, count), only this shard's tracks are kept
+    Returns:
+        int: number of rows produced
+    """
+    seen = set(done_ids)
+    produced = 0
+    for source in jobs:
+        for track in fetch_source(client, source):
+            # stored tracks, repeats across sources and other shards' tracks
+            # are never downloaded
+            if track["trackId"] in seen or not in_shard(track["trackId"], shard):
+                continue
+            seen.add(track["trackId"])
 
-        for track in tracks:
             print(f" -- processing: {track['trackName']}", end=" ", flush=True)
 
-            path = client.download_preview(track["previewUrl"], track["trackId"])
-            if not path:
-                print("download failed")
-                continue
-
-            features = client.extract_features(path)
+            # cached tracks skip the download and DSP entirely
+            features = client.features_for_track(track)
             if not features:
-                print("feature extraction failed")
+                print("download or feature extraction failed")
                 continue
 
-            features["label"] = label
+            features["label"] = source["label"]
             features["track_name"] = track["trackName"]
             features["artist"] = track["artistName"]
             features["track_id"] = track["trackId"]
 
-            dataset.append(features)
-            time.sleep(1.0)
+            on_row(features)
+            count("ingest.rows")
+            produced += 1
 
-    return dataset
+    return produced
+
+
+def merge_stores(output, shard_paths, profile=DEFAULT_PROFILE):
+    """
+    Appends the rows of per-shard stores to one store, skipping track IDs
+    it already holds
+    """
+    store = TrainingStore(output, profile=profile)
+    done_ids = store.track_ids()
+    for path in shard_paths:
+        shard_store = TrainingStore(path, profile=profile)
+        for start in range(0, len(shard_store), store.checkpoint_rows):
+            rows = shard_store.read(start=start, stop=start + store.checkpoint_rows)
+            store.append(rows[~rows["track_id"].isin(done_ids)])
+        done_ids = store.track_ids()
+    store.compact()
+    print(f"Merged {len(shard_paths)} stores, {len(store)} songs in {store.path}")
 
 
 if __name__ == "__main__":
-    ingest_data()
+    parser = argparse.ArgumentParser(description="Build the training dataset")
+    parser.add_argument(
+        "--spec",
+        default=DEFAULT_SPEC_PATH,
+        help="JSON or YAML job spec listing sources, labels and limits",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="training store directory (default: the spec's output, "
+        "else data/raw/training_store, suffixed with the profile if not full)",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default=DEFAULT_PROFILE,
+        help="feature profile to extract, lighter profiles train the models "
+        "used for fast interactive scoring",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="feature extraction processes, 1 runs the serial loop",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        help="index/count, e.g. 0/4: only ingest tracks whose ID hashes to "
+        "this shard, so several machines can split one job",
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="discard previously ingested rows instead of resuming",
+    )
+    parser.add_argument(
+        "--merge",
+        nargs="+",
+        metavar="STORE",
+        help="instead of ingesting, merge per-shard stores into --output",
+    )
+    args = parser.parse_args()
+
+    if args.merge:
+        merge_stores(
+            args.output or store_path(args.profile), args.merge, profile=args.profile
+        )
+    else:
+        ingest_data(
+            spec_path=args.spec,
+            output=args.output,
+            workers=args.workers,
+            resume=not args.fresh,
+            shard=args.shard,
+            profile=args.profile,
+        )
@@ -0,0 +1,224 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from audio_client import AudioClient
+from job_spec import fetch_source, in_shard
+from tracing import count
+
+# marks the end of a stage's output
+_DONE = object()
+
+# each worker process builds its own client on startup
+_worker_client = None
+
+
+def _init_worker(profile):
+    global _worker_client
+    _worker_client = AudioClient(profile=profile)
+
+
+def _extract_in_worker(path):
+    return _worker_client.extract_features(path)
+
+
+def _extract_bytes_in_worker(audio_bytes):
+    return _worker_client.extract_features_from_bytes(audio_bytes)
+
+
+class IngestPipeline:
+    def __init__(
+        self,
+        client,
+        workers=None,
+        fetch_threads=4,
+        queue_size=None,
+    ):
+        """
+        Staged ingestion: searches and preview downloads run on a thread
+        pool, feature extraction runs on a process pool,
+        and bounded queues sit between the stages so a slow stage applies
+        backpressure instead of piling up downloaded previews.
+
+        Args:
+            client (AudioClient): used for the network stages, its
+                rate_limiter is shared by all fetch threads
+            workers (int): feature extraction processes, defaults to cpu count
+            fetch_threads (int): concurrent download threads
+            queue_size (int): capacity of each inter-stage queue
+        """
+        self.client = client
+        self.workers = workers or os.cpu_count() or 1
+        self.fetch_threads = fetch_threads
+        self.queue_size = queue_size or self.workers * 2
+
+    def run(self, jobs, on_row, skip_ids=(), shard=None):
+        """
+        Processes every job spec source.
+
+        Each track ID is processed at most once: repeats across sources,
+        IDs in skip_ids and tracks outside the shard are dropped before
+        anything is downloaded. Rows have the same columns as the serial
+        process_artists loop and are handed to on_row as soon as their
+        features are ready, nothing is accumulated here.
+
+        Args:
+            jobs (list): source dicts from job_spec.load_job_spec
+            on_row (callable): receives each finished row
+            skip_ids (set): track IDs that are already stored
+            shard (tuple): (index, count), only this shard's tracks are kept
+        Returns:
+            int: number of rows produced
+        """
+        start = time.perf_counter()
+
+        track_queue = queue.Queue(maxsize=self.queue_size)
+        audio_queue = queue.Queue(maxsize=self.queue_size)
+
+        searcher = threading.Thread(
+            target=self._search_stage,
+            args=(jobs, set(skip_ids), shard, track_queue),
+            daemon=True,
+        )
+        fetchers = [
+            threading.Thread(
+                target=self._fetch_stage, args=(track_queue, audio_queue), daemon=True
+            )
+            for _ in range(self.fetch_threads)
+        ]
+        searcher.start()
+        for fetcher in fetchers:
+            fetcher.start()
+
+        produced = self._extract_stage(audio_queue, on_row)
+
+        searcher.join()
+        for fetcher in fetchers:
+            fetcher.join()
+
+        elapsed = time.perf_counter() - start
+        rate = produced / elapsed if elapsed > 0 else 0.0
+        print(
+            f"\nProcessed {produced} tracks in {elapsed:.1f}s "
+            f"({rate:.2f} tracks/sec, {self.workers} workers)"
+        )
+        return produced
+
+    def _make_row(self, features, track, label):
+        row = {
+            key: value
+            for key, value in features.items()
+            if key not in ("label", "track_name", "artist", "track_id")
+        }
+        row["label"] = label
+        row["track_name"] = track["trackName"]
+        row["artist"] = track["artistName"]
+        row["track_id"] = track["trackId"]
+        return row
+
+    def _search_stage(self, jobs, seen, shard, track_queue):
+        with ThreadPoolExecutor(max_workers=self.fetch_threads) as pool:
+            found = pool.map(lambda job: fetch_source(self.client, job), jobs)
+            for job, tracks in zip(jobs, found):
+                for track in tracks:
+                    # overlapping results, stored tracks and other shards'
+                    # tracks are never fetched
+                    if track["trackId"] in seen or not in_shard(
+                        track["trackId"], shard
+                    ):
+                        continue
+                    seen.add(track["trackId"])
+                    track_queue.put((track, job["label"]))
+
+        for _ in range(self.fetch_threads):
+            track_queue.put(_DONE)
+
+    def _fetch_stage(self, track_queue, audio_queue):
+        while True:
+            item = track_queue.get()
+            if item is _DONE:
+                audio_queue.put(_DONE)
+                return
+
+            track, label = item
+            # cached tracks skip the download and the process pool
+            cached = self.client.feature_cache.get(track["trackId"])
+            if cached is not None:
+                audio_queue.put((track, label, None, cached))
+                continue
+
+            # in-memory clients hand raw preview bytes to the pool, no temp file
+            if self.client.in_memory:
+                audio = self.client.download_preview_bytes(track["previewUrl"])
+            else:
+                audio = self.client.download_preview(
+                    track["previewUrl"], track["trackId"]
+                )
+            audio_queue.put((track, label, audio, None))
+
+    def _extract_stage(self, audio_queue, on_row):
+        produced = 0
+        pending = []
+        in_flight = threading.BoundedSemaphore(self.queue_size)
+
+        def emit(row):
+            nonlocal produced
+            on_row(row)
+            count("ingest.rows")
+            produced += 1
+
+        def collect(wait):
+            # hands finished extractions to on_row, blocking only when asked
+            still_running = []
+            for track, label, future in pending:
+                if not wait and not future.done():
+                    still_running.append((track, label, future))
+                    continue
+                features = future.result()
+                if not features:
+                    print(f" -- {track['trackName']}: feature extraction failed")
+                    continue
+                self.client.cache_features(track, features)
+                emit(self._make_row(features, track, label))
+            pending[:] = still_running
+
+        # spawn rather than fork, the fetch threads are live at this point
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.client.profile,),
+        ) as pool:
+            finished_fetchers = 0
+            while finished_fetchers < self.fetch_threads:
+                item = audio_queue.get()
+                if item is _DONE:
+                    finished_fetchers += 1
+                    continue
+
+                track, label, audio, cached = item
+                print(f" -- processing: {track['trackName']}")
+                if cached is not None:
+                    emit(self._make_row(cached, track, label))
+                elif not audio:
+                    print(f" -- {track['trackName']}: download failed")
+                else:
+                    # caps decoded clips held by the pool, the queue caps the rest
+                    in_flight.acquire()
+                    extract = (
+                        _extract_bytes_in_worker
+                        if self.client.in_memory
+                        else _extract_in_worker
+                    )
+                    future = pool.submit(extract, audio)
+                    future.add_done_callback(lambda _: in_flight.release())
+                    pending.append((track, label, future))
+
+                collect(wait=False)
+
+            collect(wait=True)
+
+        return produced
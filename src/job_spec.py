@@ -0,0 +1,149 @@
+import argparse
+import hashlib
+import json
+import os
+
+# YAML specs are optional, JSON always works
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+DEFAULT_LIMIT = 15
+
+SOURCE_KINDS = {"artist": "artists", "playlist": "playlists"}
+
+
+def load_job_spec(path):
+    """
+    Reads an ingestion job spec from a .json, .yaml or .yml file.
+
+    A spec lists sources to pull tracks from, each with a label and an
+    optional per-source limit (the spec's "limit" otherwise):
+
+        limit: 15
+        output: ../data/raw/training_store
+        sources:
+          - {artist: Drake, label: 1}
+          - {playlist: "https://www.deezer.com/playlist/123", label: 0, limit: 200}
+          - {artists: [Hanson, Nickelback], label: 0}
+
+    Returns:
+        dict: "sources" as a list of normalized source dicts (kind, query,
+        label, limit) and "output" as an absolute path or None
+    """
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ValueError(
+                    f"{path} is YAML but PyYAML is not installed, "
+                    "pip install pyyaml or use a JSON spec"
+                )
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+
+    if not isinstance(spec, dict) or not spec.get("sources"):
+        raise ValueError(f"{path} has no sources")
+
+    limit = int(spec.get("limit", DEFAULT_LIMIT))
+    sources = []
+    for entry in spec["sources"]:
+        sources.extend(normalize_source(entry, limit))
+
+    # relative outputs are relative to the spec file, not the working dir
+    output = spec.get("output")
+    if output:
+        output = os.path.normpath(
+            os.path.join(os.path.dirname(os.path.abspath(path)), output)
+        )
+    return {"sources": sources, "output": output}
+
+
+def normalize_source(entry, default_limit=DEFAULT_LIMIT):
+    """
+    Expands one spec entry into (kind, query, label, limit) source dicts
+    """
+    if "label" not in entry or int(entry["label"]) not in (0, 1):
+        raise ValueError(f"source needs a label of 0 or 1: {entry}")
+
+    label = int(entry["label"])
+    limit = int(entry.get("limit", default_limit))
+
+    sources = []
+    for kind, plural in SOURCE_KINDS.items():
+        queries = list(entry.get(plural, []))
+        if kind in entry:
+            queries.append(entry[kind])
+        for query in queries:
+            sources.append(
+                {"kind": kind, "query": str(query), "label": label, "limit": limit}
+            )
+
+    if not sources:
+        raise ValueError(f"source needs an artist or playlist: {entry}")
+    return sources
+
+
+def unique_sources(sources):
+    """
+    Drops repeated sources, the first entry wins. A source repeated under
+    a different label is a contradiction in the spec, not a repeat, so it
+    raises ValueError rather than silently keeping one label.
+    """
+    unique = []
+    labels = {}
+    for source in sources:
+        key = (source["kind"], source["query"])
+        if key in labels:
+            if labels[key] != source["label"]:
+                raise ValueError(
+                    f"{source['kind']} {source['query']!r} is listed with "
+                    f"label {labels[key]} and label {source['label']}"
+                )
+            print(f"Skipping repeated {source['kind']}: {source['query']}")
+            continue
+        labels[key] = source["label"]
+        unique.append(source)
+    return unique
+
+
+def fetch_source(client, source):
+    """
+    Tracks for one source, shaped like AudioClient.search_tracks items
+    """
+    if source["kind"] == "playlist":
+        print(f"\n Loading playlist {source['query']}")
+        return client.get_playlist_tracks(source["query"], limit=source["limit"])
+
+    print(f"\n Searching for {source['query']}")
+    return client.search_tracks(source["query"], limit=source["limit"])
+
+
+def parse_shard(text):
+    """
+    Parses "index/count" (e.g. "0/4") into a (index, count) tuple. Used as
+    an argparse type, so errors are ArgumentTypeErrors and argparse shows
+    their message.
+    """
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like 0/4, got {text!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(
+            f"shard index must be in [0, {count}), got {text!r}"
+        )
+    return index, count
+
+
+def in_shard(track_id, shard):
+    """
+    Whether a track belongs to a (index, count) shard. Uses a stable hash
+    of the track ID, so every machine agrees on the split.
+    """
+    if shard is None:
+        return True
+    index, count = shard
+    digest = hashlib.sha1(str(track_id).encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count == index
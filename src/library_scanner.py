@@ -0,0 +1,452 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(current_dir, "..")
+sys.path.append(current_dir)
+
+from audio_client import AudioClient
+from catalog_store import CatalogStore
+from feature_cache import FeatureCache
+from feature_engine import DEFAULT_PROFILE, feature_version
+from tracing import count, span
+
+DEFAULT_LIBRARY_PATH = os.path.join(root_dir, "data", "cache", "library.sqlite")
+
+AUDIO_EXTENSIONS = {
+    ".aac",
+    ".aif",
+    ".aiff",
+    ".flac",
+    ".m4a",
+    ".mp3",
+    ".ogg",
+    ".opus",
+    ".wav",
+}
+
+# bytes read from each end of a file for its content hash
+HASH_SAMPLE_BYTES = 1024 * 1024
+
+
+def library_path(profile=DEFAULT_PROFILE):
+    """
+    Default index file of a feature profile, one index per profile
+    """
+    if profile == DEFAULT_PROFILE:
+        return DEFAULT_LIBRARY_PATH
+    return DEFAULT_LIBRARY_PATH.replace(".sqlite", f"_{profile}.sqlite")
+
+
+class LibraryIndex:
+    def __init__(
+        self, path=DEFAULT_LIBRARY_PATH, profile=DEFAULT_PROFILE, full_length=False
+    ):
+        """
+        SQLite index of a local music library: one row per audio file with
+        its size, mtime and content hash, and its features (or the error
+        that stopped them) under the profile's feature version.
+
+        A file whose size and mtime are unchanged is never opened again.
+        Features are looked up by content hash too, so moved or renamed
+        files keep theirs without being re-extracted.
+
+        full_length=True indexes whole tracks rather than the profile's
+        excerpt. That is part of the version, so switching re-extracts.
+        """
+        self.path = path
+        self.profile = profile
+        self.full_length = full_length
+        self.version = feature_version(profile)
+        if full_length:
+            self.version += "-full-length"
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    payload TEXT,
+                    error TEXT,
+                    scanned_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS files_hash ON files (content_hash)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: path -> (size, mtime_ns, version, has_features) of every
+            indexed file, the whole index in one query
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT path, size, mtime_ns, version, payload IS NOT NULL FROM files"
+            ).fetchall()
+        return {path: tuple(rest) for path, *rest in rows}
+
+    def features_by_hash(self, hashes):
+        """
+        Returns:
+            dict: content hash -> feature payload (JSON) of already indexed
+            copies under the current version
+        """
+        found = {}
+        hashes = list(hashes)
+        with self._connect() as conn:
+            # sqlite caps the number of bound parameters per statement
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(
+                    conn.execute(
+                        f"SELECT content_hash, payload FROM files "
+                        f"WHERE version = ? AND payload IS NOT NULL "
+                        f"AND content_hash IN ({placeholders})",
+                        [self.version, *batch],
+                    ).fetchall()
+                )
+        return found
+
+    def upsert(self, rows):
+        """
+        Args:
+            rows (list): (path, size, mtime_ns, content_hash, payload, error)
+        """
+        if not rows:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash, "
+                "version, payload, error, scanned_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (path, size, mtime_ns, digest, self.version, payload, error, now)
+                    for path, size, mtime_ns, digest, payload, error in rows
+                ],
+            )
+
+    def remove(self, paths):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in paths])
+
+    def items(self, batch_size=1000):
+        """
+        Iterates every file with features under the current version
+        Yields:
+            (path, features): absolute path and feature dict
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "SELECT path, payload FROM files "
+                "WHERE version = ? AND payload IS NOT NULL",
+                (self.version,),
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for path, payload in rows:
+                    yield path, json.loads(payload)
+
+
+def walk_audio_files(roots, unreadable=None):
+    """
+    Every audio file under the given directories, by extension
+    Args:
+        roots (list): directories to walk
+        unreadable (list): if given, directories that could not be listed
+            (missing, unmounted, no permission) are appended to it
+    Yields:
+        (path, size, mtime_ns): absolute path and the stat fields the
+        index compares, taken from os.scandir so no extra stat calls
+    """
+    stack = [os.path.abspath(root) for root in roots]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            print(f"Cannot read {directory}: {e}")
+            if unreadable is not None:
+                unreadable.append(directory)
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime_ns
+            except OSError:
+                continue
+
+
+def content_hash(path, size, sample_bytes=HASH_SAMPLE_BYTES):
+    """
+    sha1 of the size and the first and last sample_bytes of a file, enough
+    to recognise the same audio after a move without reading whole albums
+    """
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(sample_bytes))
+        if size > 2 * sample_bytes:
+            f.seek(-sample_bytes, os.SEEK_END)
+        digest.update(f.read(sample_bytes))
+    return digest.hexdigest()
+
+
+# each worker process builds its own client on startup
+_worker_client = None
+
+
+def _init_worker(profile, state_dir):
+    global _worker_client
+    # workers only extract, but a client always opens a feature cache and
+    # a catalog. Those live beside the index, so a scan only ever writes
+    # where its index is
+    _worker_client = AudioClient(
+        profile=profile,
+        feature_cache=FeatureCache(
+            os.path.join(state_dir, "features.sqlite"), profile=profile
+        ),
+        catalog_store=CatalogStore(
+            os.path.join(state_dir, "catalog.sqlite"), profile=profile
+        ),
+    )
+
+
+def _extract_in_worker(path, full_length):
+    if full_length:
+        return _worker_client.extract_features_streaming(path)
+    # the source file is the user's, it must never be deleted
+    return _worker_client.extract_features(path, delete=False)
+
+
+def scan_library(
+    roots,
+    index=None,
+    workers=None,
+    profile=DEFAULT_PROFILE,
+    full_length=False,
+    retry_failed=False,
+    checkpoint_rows=200,
+):
+    """
+    Brings the index up to date with the audio files under roots.
+
+    Unchanged files (same size, mtime and feature version) are skipped
+    without being opened, so a rescan costs one directory walk and one
+    query. Changed and new files are hashed; copies whose hash is already
+    indexed reuse those features and the rest are extracted in a process
+    pool. Rows are written every checkpoint_rows files, so an interrupted
+    scan resumes where it stopped. Files gone from disk leave the index,
+    except under directories that could not be read: an unmounted drive
+    keeps its rows rather than being re-extracted once it is back.
+    Args:
+        roots (list): directories to scan
+        index (LibraryIndex): defaults to the profile's index, its profile
+            and full_length win over the arguments below
+        workers (int): extraction processes, defaults to cpu count
+        profile (str): feature profile to extract
+        full_length (bool): analyse whole tracks with streaming extraction
+            instead of the profile's excerpt
+        retry_failed (bool): extract unchanged files that failed before
+    Returns:
+        dict: counts of unchanged, reused, extracted, failed and removed files
+    """
+    if index is None:
+        index = LibraryIndex(library_path(profile), profile, full_length)
+    workers = workers or os.cpu_count() or 1
+    stats = {"unchanged": 0, "reused": 0, "extracted": 0, "failed": 0, "removed": 0}
+
+    with span("library.scan"):
+        known = index.snapshot()
+        seen = set()
+        todo = []
+        unreadable = []
+        for path, size, mtime_ns in walk_audio_files(roots, unreadable):
+            seen.add(path)
+            entry = known.get(path)
+            if (
+                entry is not None
+                and entry[:3] == (size, mtime_ns, index.version)
+                and (entry[3] or not retry_failed)
+            ):
+                stats["unchanged"] += 1
+                continue
+            todo.append((path, size, mtime_ns))
+
+        # only files under the scanned roots can be known to be gone, and
+        # not those under a directory that couldn't be listed
+        prefixes = tuple(os.path.join(os.path.abspath(r), "") for r in roots)
+        kept = tuple(os.path.join(d, "") for d in unreadable)
+        removed = [
+            p
+            for p in known
+            if p not in seen and p.startswith(prefixes) and not p.startswith(kept)
+        ]
+
+        print(
+            f"{len(seen)} audio files, {stats['unchanged']} unchanged, "
+            f"{len(todo)} to index, {len(removed)} removed"
+        )
+        if todo:
+            _index_files(index, todo, workers, checkpoint_rows, stats)
+
+        # after indexing, so moved files could still find their old rows
+        index.remove(removed)
+        stats["removed"] = len(removed)
+
+    count("library.extracted", stats["extracted"])
+    return stats
+
+
+def _index_files(index, todo, workers, checkpoint_rows, stats):
+    # hashing is file I/O, threads overlap it fine
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        digests = list(pool.map(lambda f: _safe_hash(f[0], f[1]), todo))
+
+    known_features = index.features_by_hash(d for d in digests if d)
+    pending = []
+
+    def record(row):
+        pending.append(row)
+        if len(pending) >= checkpoint_rows:
+            index.upsert(pending)
+            pending.clear()
+
+    to_extract = []
+    for (path, size, mtime_ns), digest in zip(todo, digests):
+        if digest is None:
+            stats["failed"] += 1
+        elif digest in known_features:
+            # a moved or copied file, its features are already known
+            record((path, size, mtime_ns, digest, known_features[digest], None))
+            stats["reused"] += 1
+        else:
+            to_extract.append((path, size, mtime_ns, digest))
+
+    try:
+        # spawn rather than fork, the hashing threads may still hold locks
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(index.profile, os.path.dirname(os.path.abspath(index.path))),
+        ) as pool:
+            futures = {
+                pool.submit(_extract_in_worker, item[0], index.full_length): item
+                for item in to_extract
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                path, size, mtime_ns, digest = futures[future]
+                try:
+                    features = future.result()
+                except Exception as e:
+                    features, error = None, str(e)
+                else:
+                    error = None if features else "feature extraction failed"
+
+                if features:
+                    payload = json.dumps(features)
+                    stats["extracted"] += 1
+                else:
+                    payload = None
+                    stats["failed"] += 1
+                    print(f" -- {path}: {error}")
+                record((path, size, mtime_ns, digest, payload, error))
+
+                if done % 100 == 0:
+                    print(f"Extracted {done} of {len(to_extract)}", flush=True)
+    finally:
+        # also on Ctrl-C, so finished files aren't extracted again
+        index.upsert(pending)
+
+
+def _safe_hash(path, size):
+    try:
+        return content_hash(path, size)
+    except OSError as e:
+        print(f" -- {path}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from feature_engine import PROFILES
+
+    parser = argparse.ArgumentParser(
+        description="Index the features of a local music library"
+    )
+    parser.add_argument("roots", nargs="+", help="directories to scan")
+    parser.add_argument(
+        "--index",
+        default=None,
+        help="index file (default: data/cache/library.sqlite, suffixed with "
+        "the profile if not full)",
+    )
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="feature extraction processes",
+    )
+    parser.add_argument(
+        "--full-length",
+        action="store_true",
+        help="analyse whole tracks (streaming, bounded memory) instead of "
+        "the profile's excerpt",
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="retry unchanged files whose extraction failed before",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = LibraryIndex(
+        args.index or library_path(args.profile), args.profile, args.full_length
+    )
+    stats = scan_library(
+        args.roots,
+        index=index,
+        workers=args.workers,
+        retry_failed=args.retry_failed,
+    )
+    print(
+        f"Scanned in {time.perf_counter() - start:.1f}s: "
+        + ", ".join(f"{value} {name}" for name, value in stats.items())
+        + f", {len(index)} files in {index.path}"
+    )
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import threading
+
+import joblib
+
+
+class _Entry:
+    def __init__(self, artifact, mtime_ns, size, digest):
+        self.artifact = artifact
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """
+    sha256 of a file's contents, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, mmap_mode=None):
+        """
+        Process-wide cache of joblib artifacts (models, scalers).
+
+        Each file is unpickled once and the same object is handed to every
+        caller, so Streamlit reruns and sessions share it. A get() only
+        costs an os.stat. The file is re-hashed when its mtime or size
+        changes, and reloaded only when the contents actually differ.
+
+        Args:
+            mmap_mode (str): passed to joblib.load, "r" memory-maps the
+                numpy arrays inside the artifact instead of copying them.
+                Only safe when writers replace files atomically (write a
+                temp file, then os.replace), never by rewriting in place.
+        """
+        self.mmap_mode = mmap_mode
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Returns the artifact stored at path, loading or reloading as needed.
+        Raises FileNotFoundError if path does not exist.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if (
+                entry is not None
+                and entry.mtime_ns == stat.st_mtime_ns
+                and entry.size == stat.st_size
+            ):
+                return entry.artifact
+
+            digest = file_digest(path)
+            if entry is not None and entry.digest == digest:
+                # touched but unchanged, keep the loaded object
+                entry.mtime_ns = stat.st_mtime_ns
+                entry.size = stat.st_size
+                return entry.artifact
+
+            artifact = joblib.load(path, mmap_mode=self.mmap_mode)
+            self._entries[path] = _Entry(
+                artifact, stat.st_mtime_ns, stat.st_size, digest
+            )
+            return artifact
+
+    def evict(self, path):
+        """
+        Drops a cached artifact so the next get() loads it from disk
+        """
+        with self._lock:
+            self._entries.pop(os.path.abspath(path), None)
+
+
+# shared by every page and session in the Streamlit process. Every writer
+# (ModelStore.save, optimization.save_model) renames finished files into
+# place, so the arrays can be memory-mapped rather than copied
+registry = ModelRegistry(mmap_mode="r")
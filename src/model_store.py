@@ -0,0 +1,143 @@
+import errno
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import joblib
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(current_dir, "..")
+sys.path.append(current_dir)
+
+from model_registry import registry as shared_registry
+from train_model import as_pipeline
+
+DEFAULT_STORE_PATH = os.path.join(root_dir, "models", "users")
+
+VERSION_PATTERN = re.compile(r"^v(\d+)$")
+
+
+class ModelStore:
+    def __init__(self, root=DEFAULT_STORE_PATH, keep=3, registry=None):
+        """
+        Versioned on-disk store of per-user models.
+
+        Layout: <root>/<profile>/v0001/{model.pkl, meta.json}, model.pkl is
+        the fitted scaler + classifier pipeline.
+        meta.json records the feature-schema hash, the number of training
+        rows and the training metrics. Each version is written to a temp
+        directory and renamed into place, so readers never see a half
+        written entry, and a writer that loses the race for a version
+        number retries with the next one. Only the newest `keep` versions are retained.
+
+        Loaded versions are served from `registry` (a ModelRegistry), the
+        process-wide one by default.
+        """
+        self.root = root
+        self.keep = keep
+        self.registry = registry if registry is not None else shared_registry
+
+    def profile_dir(self, profile_id):
+        safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", str(profile_id)) or "default"
+        return os.path.join(self.root, safe_id)
+
+    def versions(self, profile_id):
+        """
+        Version numbers stored for a profile, oldest first
+        """
+        directory = self.profile_dir(profile_id)
+        if not os.path.isdir(directory):
+            return []
+
+        found = []
+        for name in os.listdir(directory):
+            match = VERSION_PATTERN.match(name)
+            if match:
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    def version_dir(self, profile_id, version):
+        return os.path.join(self.profile_dir(profile_id), f"v{version:04d}")
+
+    def save(self, profile_id, model, schema_hash, n_rows, metrics=None):
+        """
+        Stores a trained model as the profile's newest version
+        Returns:
+            int: the new version number
+        """
+        directory = self.profile_dir(profile_id)
+        os.makedirs(directory, exist_ok=True)
+
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=directory)
+        try:
+            joblib.dump(model, os.path.join(staging, "model.pkl"))
+
+            existing = self.versions(profile_id)
+            version = (existing[-1] if existing else 0) + 1
+            while True:
+                meta = {
+                    "version": version,
+                    "schema_hash": schema_hash,
+                    "n_rows": int(n_rows),
+                    "metrics": metrics or {},
+                    "created_at": time.time(),
+                }
+                with open(os.path.join(staging, "meta.json"), "w") as f:
+                    json.dump(meta, f, indent=2)
+
+                try:
+                    os.rename(staging, self.version_dir(profile_id, version))
+                    break
+                except OSError as e:
+                    if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                        raise
+                    # another process saved this version first, take the
+                    # next free number
+                    version = max([version] + self.versions(profile_id)) + 1
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        self.gc(profile_id)
+        return version
+
+    def load_latest(self, profile_id, schema_hash):
+        """
+        Loads the newest version trained on the given feature schema
+        Returns:
+            (model, meta), or None if nothing compatible is stored
+        """
+        for version in reversed(self.versions(profile_id)):
+            directory = self.version_dir(profile_id, version)
+            try:
+                with open(os.path.join(directory, "meta.json")) as f:
+                    meta = json.load(f)
+                if meta.get("schema_hash") != schema_hash:
+                    continue
+
+                # the registry shares loaded versions across sessions
+                model = self.registry.get(os.path.join(directory, "model.pkl"))
+
+                # versions saved before pipelines kept the scaler separately
+                scaler_path = os.path.join(directory, "scaler.pkl")
+                if os.path.exists(scaler_path):
+                    model = as_pipeline(model, self.registry.get(scaler_path))
+                return model, meta
+            except (OSError, ValueError) as e:
+                print(f"Skipping unreadable model {directory}: {e}")
+        return None
+
+    def gc(self, profile_id, keep=None):
+        """
+        Deletes all but the newest `keep` versions of a profile
+        """
+        keep = self.keep if keep is None else keep
+        for version in self.versions(profile_id)[: -keep or None]:
+            directory = self.version_dir(profile_id, version)
+            self.registry.evict(os.path.join(directory, "model.pkl"))
+            self.registry.evict(os.path.join(directory, "scaler.pkl"))
+            shutil.rmtree(directory, ignore_errors=True)
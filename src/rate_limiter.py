@@ -0,0 +1,41 @@
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        """
+        Thread-safe token bucket.
+
+        Tokens refill continuously at `rate` per second up to `capacity`,
+        so short bursts go through immediately while the long-run request
+        rate stays at `rate`.
+
+        Args:
+            rate (float): tokens added per second
+            capacity (float): maximum burst size, defaults to one second of tokens
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until `tokens` are available, then takes them
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,130 @@
+import heapq
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from feature_engine import FEATURE_COLUMNS
+from scoring import predict_matrix
+
+
+class Catalog:
+    def __init__(self, ids, X, info, columns=FEATURE_COLUMNS):
+        """
+        Candidate tracks with precomputed features, held as one float32
+        matrix so they can be scored in large slices.
+        Args:
+            ids (np.ndarray): track IDs, one per row of X
+            X (np.ndarray): (n, features) float32 matrix laid out as columns
+            info (list): display info per row (trackName, artistName)
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.X = np.asarray(X, dtype=np.float32)
+        self.info = info
+        self.columns = list(columns)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_store(cls, store):
+        """
+        Every track in a CatalogStore, i.e. everything that came through a
+        search, playlist or ingestion run with the current extractor
+        """
+        ids, X, info = store.load()
+        return cls(ids, X, info, columns=store.columns)
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def load_catalog(store):
+    """
+    Process-wide Catalog of a CatalogStore. Loading every vector is the
+    slow part, so it is only redone when the store's stamp (feature
+    version, row count, latest write) changes.
+    """
+    stamp = store.stamp()
+    key = (store.path, store.version)
+    with _catalogs_lock:
+        entry = _catalogs.get(key)
+        if entry is None or entry[0] != stamp:
+            entry = (stamp, Catalog.from_store(store))
+            _catalogs[key] = entry
+        return entry[1]
+
+
+def recommend(model, catalog, k=20, exclude=(), batch_size=16384):
+    """
+    Top-k catalog tracks by the model's like probability.
+
+    The catalog is scored in batches of batch_size rows, one predict_proba
+    call each. Each batch's best k are pushed through a min-heap bounded
+    at k, so memory stays flat however large the catalog is.
+
+    Args:
+        model: fitted scaler + classifier pipeline
+        catalog (Catalog): candidates
+        k (int): number of recommendations
+        exclude (set): track IDs to leave out, e.g. already labelled songs
+        batch_size (int): rows per predict_proba call
+    Returns:
+        list: dicts with trackId, trackName, artistName and probability,
+        most likely like first
+    """
+    if model is None or not len(catalog) or k <= 0:
+        return []
+
+    # the model may have been fitted on a different column order
+    columns = list(getattr(model, "feature_names_in_", catalog.columns))
+    position = {col: i for i, col in enumerate(catalog.columns)}
+    order = [position[col] for col in columns]
+    reorder = order != list(range(len(catalog.columns)))
+
+    # placeholder IDs such as "diag_0" name no catalog track
+    excluded = np.array(
+        [int(track_id) for track_id in exclude if str(track_id).isdigit()],
+        dtype=np.int64,
+    )
+
+    heap = []
+    for start in range(0, len(catalog), batch_size):
+        stop = min(start + batch_size, len(catalog))
+        batch = catalog.X[start:stop]
+        if reorder:
+            batch = batch[:, order]
+
+        _, probabilities = predict_matrix(model, pd.DataFrame(batch, columns=columns))
+        if len(excluded):
+            probabilities = np.where(
+                np.isin(catalog.ids[start:stop], excluded), -1.0, probabilities
+            )
+
+        # only this batch's best k can make it into the overall top k
+        top = np.argpartition(-probabilities, min(k, len(batch)) - 1)[:k]
+        for i in top:
+            probability = float(probabilities[i])
+            if probability < 0:
+                continue
+            item = (probability, start + int(i))
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    return [
+        {
+            "trackId": int(catalog.ids[row]),
+            "trackName": catalog.info[row].get("trackName"),
+            "artistName": catalog.info[row].get("artistName"),
+            "probability": probability,
+        }
+        for probability, row in sorted(heap, reverse=True)
+    ]
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from async_audio_client import AsyncAudioClient
+from feature_engine import FEATURE_COLUMNS
+from tracing import count, span
+
+
+def feature_matrix(feature_rows, model=None):
+    """
+    Stacks feature dicts into one float32 frame.
+
+    Columns follow the order the model pipeline was fitted on when it
+    recorded one, otherwise the extractor's FEATURE_COLUMNS.
+    """
+    columns = list(getattr(model, "feature_names_in_", FEATURE_COLUMNS))
+    matrix = np.array(
+        [[row[col] for col in columns] for row in feature_rows], dtype=np.float32
+    )
+    return pd.DataFrame(matrix, columns=columns)
+
+
+def predict_matrix(model, X):
+    """
+    Scores a whole feature matrix in a single pass through the fitted
+    scaler + classifier pipeline.
+
+    The label is derived from the probabilities instead of a second
+    model.predict call, which would walk every tree again.
+    Returns:
+        (labels, like_probabilities): two arrays with one entry per row
+    """
+    with span("predict_proba", rows=len(X)):
+        probabilities = model.predict_proba(X)
+    count("predictions", len(X))
+    classes = np.asarray(model.classes_)
+
+    labels = classes[np.argmax(probabilities, axis=1)]
+    if 1 in classes:
+        like_probabilities = probabilities[:, list(classes).index(1)]
+    else:
+        like_probabilities = np.zeros(len(X))
+    return labels, like_probabilities
+
+
+def score_resolved(tracks, model, client, max_workers=4):
+    """
+    Scores already resolved track dicts (search_tracks / get_track shape).
+
+    Features are fetched concurrently, cached tracks skip the audio work.
+    Returns:
+        list: one dict per input track with its info plus "prediction",
+        "probability" and "tempo" (None for profiles without rhythm), or
+        None where no features could be made
+    """
+    if not tracks:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        all_features = list(pool.map(client.features_for_track, tracks))
+
+    scored = [i for i, features in enumerate(all_features) if features]
+    results = [None] * len(tracks)
+    if not scored:
+        return results
+
+    X = feature_matrix([all_features[i] for i in scored], model)
+    labels, probabilities = predict_matrix(model, X)
+
+    for i, label, probability in zip(scored, labels, probabilities):
+        results[i] = {
+            **tracks[i],
+            "prediction": int(label),
+            "probability": float(probability),
+            "tempo": all_features[i].get("tempo"),
+        }
+    return results
+
+
+def iter_scores(tracks, model, client, max_workers=4):
+    """
+    Streaming variant of score_resolved for large track lists.
+
+    Feature extraction runs in the background and each track is scored as
+    soon as its features are ready, so callers can show results while the
+    rest are still being processed.
+    Yields:
+        (index, result): index into tracks and its score_resolved entry
+    """
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            pool.submit(client.features_for_track, track): i
+            for i, track in enumerate(tracks)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            features = future.result()
+            if not features:
+                yield i, None
+                continue
+
+            labels, probabilities = predict_matrix(
+                model, feature_matrix([features], model)
+            )
+            yield i, {
+                **tracks[i],
+                "prediction": int(labels[0]),
+                "probability": float(probabilities[0]),
+                "tempo": features.get("tempo"),
+            }
+    finally:
+        # a Streamlit rerun can abandon the generator, don't block on the rest
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def score_tracks(track_ids, model, client, max_workers=4):
+    """
+    Scores many Deezer tracks in one call.
+
+    Track lookups run concurrently through AsyncAudioClient, features are
+    extracted concurrently, and the stacked matrix goes through the model
+    pipeline once.
+
+    Args:
+        track_ids (list): Deezer track IDs
+        model: fitted scaler + classifier pipeline (see build_pipeline)
+        client (AudioClient): used for lookups, downloads and the feature cache
+        max_workers (int): concurrent feature extractions
+    Returns:
+        list: aligned with track_ids, see score_resolved
+    """
+    tracks = asyncio.run(AsyncAudioClient(client).get_tracks(track_ids))
+
+    resolved = [i for i, track in enumerate(tracks) if track]
+    scores = score_resolved([tracks[i] for i in resolved], model, client, max_workers)
+
+    results = [None] * len(track_ids)
+    for i, score in zip(resolved, scores):
+        results[i] = score
+    return results
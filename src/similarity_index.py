@@ -0,0 +1,313 @@
+import os
+import sys
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(current_dir, "..")
+sys.path.append(current_dir)
+
+from feature_engine import (
+    FEATURE_COLUMNS,
+    dict_to_vector,
+    profile_columns,
+    schema_hash,
+)
+
+DEFAULT_INDEX_PATH = os.path.join(root_dir, "data", "cache", "similarity_index.npz")
+
+
+class SimilarityIndex:
+    def __init__(self, n_lists=None, n_probe=8, kmeans_iterations=10, seed=42):
+        """
+        Approximate nearest-neighbour index over feature vectors (IVF).
+
+        Vectors are standardized with the mean and std of the indexed
+        tracks, then scaled to unit length, so similarity is the cosine of
+        the standardized features. k-means splits them into n_lists
+        clusters (about sqrt(n) by default) and each cluster's vectors are
+        stored contiguously. A query scores the centroids, then only the
+        n_probe closest clusters, one matrix-vector product per cluster.
+
+        Args:
+            n_lists (int): number of clusters, defaults to sqrt(n)
+            n_probe (int): clusters searched per query, more is slower
+                but more exact
+            kmeans_iterations (int): Lloyd iterations when building
+            seed (int): seeds the k-means initialisation and sampling
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+
+        self.columns = list(FEATURE_COLUMNS)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, len(self.columns)), dtype=np.float32)
+        self.centroids = None
+        self.offsets = None
+        self.mean = None
+        self.scale = None
+        self._positions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    # -- building --
+
+    def build(self, ids, X, columns=FEATURE_COLUMNS):
+        """
+        Indexes raw (unscaled) feature vectors
+        Args:
+            ids (list): track IDs, one per row of X
+            X (np.ndarray): (n, features) matrix laid out as columns
+            columns (list): feature names of X's columns
+        Returns:
+            SimilarityIndex: self
+        """
+        X = np.asarray(X, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        self.columns = list(columns)
+
+        if not len(X):
+            # nothing to cluster, search() and friends return []
+            self.ids = ids
+            self.vectors = np.empty((0, len(self.columns)), dtype=np.float32)
+            self.centroids = np.empty((0, len(self.columns)), dtype=np.float32)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.mean = np.zeros(len(self.columns), dtype=np.float32)
+            self.scale = np.ones(len(self.columns), dtype=np.float32)
+            self._positions = {}
+            return self
+
+        self.mean = X.mean(axis=0)
+        std = X.std(axis=0)
+        # constant features carry no similarity information
+        self.scale = np.where(std > 0, 1.0 / np.maximum(std, 1e-12), 0.0).astype(
+            np.float32
+        )
+        unit = self._normalize(X)
+
+        # never more clusters than vectors
+        n_lists = self.n_lists or int(np.sqrt(len(unit)))
+        n_lists = min(max(n_lists, 1), len(unit))
+        centroids = self._kmeans(unit, n_lists)
+        assignment = np.argmax(unit @ centroids.T, axis=1)
+
+        # cluster by cluster, so each list is one contiguous slice
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=n_lists)
+
+        self.ids = ids[order]
+        self.vectors = np.ascontiguousarray(unit[order])
+        self.centroids = centroids
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._positions = {int(track_id): i for i, track_id in enumerate(self.ids)}
+        return self
+
+    @classmethod
+    def from_cache(cls, cache, **kwargs):
+        """
+        Builds an index over every track in a FeatureCache, laid out as
+        the columns of the cache's profile
+        """
+        columns = profile_columns(cache.profile)
+        ids = []
+        rows = []
+        for track_id, features, _ in cache.items():
+            try:
+                rows.append(dict_to_vector(features, columns))
+                ids.append(int(track_id))
+            except (KeyError, ValueError):
+                # entries from an older feature layout
+                continue
+        X = np.array(rows, dtype=np.float32).reshape(-1, len(columns))
+        return cls(**kwargs).build(ids, X, columns)
+
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        """
+        Builds an index over every row of a TrainingStore
+        """
+        df = store.read(store.columns + ["track_id"])
+        return cls(**kwargs).build(
+            df["track_id"].to_numpy(), df[store.columns].to_numpy(), store.columns
+        )
+
+    def _normalize(self, X):
+        scaled = (np.atleast_2d(X) - self.mean) * self.scale
+        norms = np.linalg.norm(scaled, axis=1, keepdims=True)
+        return (scaled / np.maximum(norms, 1e-12)).astype(np.float32)
+
+    def _kmeans(self, unit, n_lists):
+        """
+        Spherical k-means on a sample of the vectors, enough to place the
+        centroids without paying for every row on every iteration
+        """
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(unit), max(n_lists * 40, 1000))
+        sample = unit[rng.choice(len(unit), sample_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+
+        for _ in range(self.kmeans_iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # an empty cluster keeps its previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        return centroids.astype(np.float32)
+
+    # -- querying --
+
+    def vector_for(self, features):
+        """
+        Raw feature vector for a feature dict, in the index's column order
+        """
+        return dict_to_vector(features, self.columns)
+
+    def search(self, vector, k=10, exclude=(), n_probe=None):
+        """
+        Approximate k most similar indexed tracks to a raw feature vector
+        Args:
+            vector (np.ndarray): raw features laid out as self.columns
+            k (int): number of results
+            exclude (set): track IDs to leave out, e.g. the query itself
+            n_probe (int): overrides the index's n_probe
+        Returns:
+            list: (track_id, similarity) pairs, most similar first
+        """
+        if not len(self):
+            return []
+        positions, scores = self._probe(self._normalize(vector)[0], n_probe)
+        return self._top_k(positions, scores, k, exclude)
+
+    def similar_to(self, track_id, k=10, n_probe=None):
+        """
+        Tracks most similar to an indexed track, e.g. a liked song
+        """
+        position = self._positions.get(int(track_id))
+        if position is None:
+            return []
+        # the stored vector is already normalized
+        positions, scores = self._probe(self.vectors[position], n_probe)
+        return self._top_k(positions, scores, k, {int(track_id)})
+
+    def nearest_among(self, vector, track_ids, k=10):
+        """
+        Exact k most similar tracks within a subset, e.g. the nearest liked
+        tracks to a candidate. Subset tracks that aren't indexed are skipped.
+        """
+        positions = np.array(
+            [self._positions[int(t)] for t in track_ids if int(t) in self._positions],
+            dtype=np.int64,
+        )
+        if not len(positions):
+            return []
+        query = self._normalize(vector)[0]
+        return self._top_k(positions, self.vectors[positions] @ query, k, ())
+
+    def _probe(self, query, n_probe=None):
+        """
+        Scores the vectors of the n_probe clusters closest to a normalized
+        query, one slice at a time so nothing is copied
+        """
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        positions = np.concatenate(
+            [np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists]
+        )
+        scores = np.concatenate(
+            [self.vectors[self.offsets[i] : self.offsets[i + 1]] @ query for i in lists]
+        )
+        return positions, scores
+
+    def _top_k(self, positions, scores, k, exclude):
+        if exclude:
+            keep = ~np.isin(self.ids[positions], list(exclude))
+            positions, scores = positions[keep], scores[keep]
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[positions[i]]), float(scores[i])) for i in top]
+
+    # -- persistence --
+
+    def save(self, path=DEFAULT_INDEX_PATH):
+        """
+        Writes the index as one .npz file (no pickle), temp file then rename
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp.npz"
+        np.savez(
+            temp_path,
+            ids=self.ids,
+            vectors=self.vectors,
+            centroids=self.centroids,
+            offsets=self.offsets,
+            mean=self.mean,
+            scale=self.scale,
+            columns=np.array(self.columns),
+            schema_hash=np.array(schema_hash(self.columns)),
+            n_probe=np.array(self.n_probe),
+        )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH):
+        """
+        Reads an index written by save()
+        Returns:
+            SimilarityIndex, or None if the file is missing or was built
+            on a different feature schema
+        """
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            columns = data["columns"].tolist()
+            if str(data["schema_hash"]) != schema_hash(columns):
+                print(f"Ignoring similarity index {path}: feature schema changed")
+                return None
+
+            index = cls(n_probe=int(data["n_probe"]))
+            index.columns = columns
+            index.ids = data["ids"]
+            index.vectors = data["vectors"]
+            index.centroids = data["centroids"]
+            index.offsets = data["offsets"]
+            index.mean = data["mean"]
+            index.scale = data["scale"]
+        index._positions = {int(track_id): i for i, track_id in enumerate(index.ids)}
+        return index
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from feature_cache import FeatureCache
+    from training_store import TrainingStore
+
+    parser = argparse.ArgumentParser(description="Build the similarity index")
+    parser.add_argument(
+        "--source",
+        choices=("cache", "store"),
+        default="cache",
+        help="index the feature cache or the training store",
+    )
+    parser.add_argument("--output", default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.source == "store":
+        index = SimilarityIndex.from_store(TrainingStore())
+    else:
+        index = SimilarityIndex.from_cache(FeatureCache())
+    index.save(args.output)
+    print(
+        f"Indexed {len(index)} tracks in {time.perf_counter() - start:.1f}s, "
+        f"saved to {args.output}"
+    )
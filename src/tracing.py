@@ -0,0 +1,244 @@
+import atexit
+import bisect
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# tracing is off unless one of these is set:
+#   SONG_TRACE=path.jsonl      every span as one JSON line
+#   SONG_TRACE_PROM=path.prom  counters and histograms in Prometheus text
+TRACE_ENV = "SONG_TRACE"
+PROMETHEUS_ENV = "SONG_TRACE_PROM"
+
+# histogram buckets in seconds, from a cache hit up to a slow download
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Tracer:
+    def __init__(self, jsonl_path=None, prometheus_path=None, flush_every=256):
+        """
+        Collects spans, counters and histograms for one process.
+
+        Spans are buffered and appended to jsonl_path in batches, which
+        worker processes can share since every batch is one append.
+        Counters and histograms stay in memory and are written to
+        prometheus_path in Prometheus text format at exit (with a pid
+        suffix in child processes, so workers don't overwrite the parent).
+        """
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.flush_every = flush_every
+        self.enabled = bool(jsonl_path or prometheus_path)
+
+        self.counters = {}
+        self.histograms = {}
+        self._spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        if self.enabled:
+            atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get(TRACE_ENV), os.environ.get(PROMETHEUS_ENV))
+
+    # -- recording --
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Times the enclosed block as a span and records its duration in
+        the "<name>" histogram. Nested spans record their parent.
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent = stack[-1] if stack else None
+
+        stack.append(name)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            self.observe(name, duration)
+
+            if self.jsonl_path:
+                record = {
+                    "ts": time.time(),
+                    "name": name,
+                    "duration_ms": duration * 1000,
+                    "parent": parent,
+                    "pid": os.getpid(),
+                    "thread": threading.get_ident(),
+                }
+                if attrs:
+                    record["attrs"] = attrs
+                if error:
+                    record["error"] = error
+                with self._lock:
+                    self._spans.append(record)
+                    full = len(self._spans) >= self.flush_every
+                if full:
+                    self.flush()
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = {
+                    "buckets": [0] * (len(BUCKETS) + 1),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            histogram["buckets"][bisect.bisect_left(BUCKETS, value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    # -- exporting --
+
+    def flush(self):
+        """
+        Appends buffered spans to the JSON-lines file
+        """
+        with self._lock:
+            spans, self._spans = self._spans, []
+        if not spans or not self.jsonl_path:
+            return
+
+        lines = "".join(json.dumps(span, default=str) + "\n" for span in spans)
+        os.makedirs(os.path.dirname(os.path.abspath(self.jsonl_path)), exist_ok=True)
+        with open(self.jsonl_path, "a") as f:
+            f.write(lines)
+
+    def prometheus_text(self):
+        """
+        Counters and histograms in Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = metric_name(name) + "_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+            for name, histogram in sorted(self.histograms.items()):
+                metric = metric_name(name) + "_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS, histogram["buckets"]):
+                    cumulative += bucket
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram["count"]}')
+                lines.append(f"{metric}_sum {histogram['sum']}")
+                lines.append(f"{metric}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        self.flush()
+        if not self.prometheus_path:
+            return
+
+        path = self.prometheus_path
+        if multiprocessing.parent_process() is not None:
+            path = f"{path}.{os.getpid()}"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, path)
+
+
+def metric_name(name):
+    return "song_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+# pages import this module as src.tracing and the src modules as bare
+# tracing, both names must share one tracer
+for _module_name in ("tracing", "src.tracing"):
+    _module = sys.modules.get(_module_name)
+    if _module is not None and hasattr(_module, "tracer"):
+        tracer = _module.tracer
+        break
+else:
+    tracer = Tracer.from_env()
+
+
+# -- module-level helpers --
+# with tracing off these are the no-op versions below, so instrumented
+# code only pays for one function call
+
+
+def _span(name, **attrs):
+    return tracer.span(name, **attrs)
+
+
+def _count(name, value=1):
+    tracer.count(name, value)
+
+
+def _observe(name, value):
+    tracer.observe(name, value)
+
+
+def _noop_span(name, **attrs):
+    return _NOOP_SPAN
+
+
+def _noop(name, value=1):
+    pass
+
+
+def _traced(name=None):
+    """
+    Decorator form of span, named after the function by default
+    """
+
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name):
+                return func(*args, **kwargs)
+
+        wrapper.__name__ = func.__name__
+        wrapper.__qualname__ = func.__qualname__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+
+    return decorate
+
+
+def _noop_traced(name=None):
+    # returns the function itself, so disabled tracing costs nothing per call
+    return lambda func: func
+
+
+if tracer.enabled:
+    span, count, observe, traced = _span, _count, _observe, _traced
+else:
+    span, count, observe, traced = _noop_span, _noop, _noop, _noop_traced
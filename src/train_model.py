@@ -1,53 +1,174 @@
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
 
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(current_dir, "..")
+sys.path.append(current_dir)
+
+from feature_engine import DEFAULT_PROFILE
+from tracing import span
+
+MODEL_DIR = os.path.join(root_dir, "models")
+
+
+METADATA_COLS = [
+    "track_name",
+    "artist",
+    "track_id",
+    "preview_url",
+    "filename",
+    "label",
+]
+
+
+def split_features(df):
+    """
+    Splits a training frame into the feature columns and the label
+    """
+    # remove metadata info
+    # TODO: maybe use artist to inform model later?
+    existing_cols = [col for col in METADATA_COLS if col in df.columns]
+
+    # features
+    X = df.drop(columns=existing_cols)
+    # target var
+    y = df["label"]
+    return X, y
+
+
+def song_to_track(song):
+    """
+    Converts a profile-builder song dict to the AudioClient track shape
+    """
+    return {
+        "trackId": song["id"],
+        "trackName": song.get("name"),
+        "artistName": song.get("artist"),
+        "previewUrl": song.get("preview"),
+    }
+
+
+def labelled_row(features, song, label):
+    """
+    One training row: the song's features plus label and metadata
+    """
+    row = dict(features)
+    row["label"] = label
+    row["track_name"] = song.get("name")
+    row["artist"] = song.get("artist")
+    row["track_id"] = song["id"]
+    return row
+
+
+def build_training_frame(client, liked_songs, disliked_songs, max_workers=4):
+    """
+    Builds a training frame from the songs picked in the profile builder
+    Args:
+        client (AudioClient): used for features, cached tracks skip the DSP
+        liked_songs (list): song dicts with id, name, artist and preview
+        disliked_songs (list): same shape as liked_songs
+    Returns:
+        pd.DataFrame: one row per song whose features could be extracted
+    """
+    labelled = [(song, 1) for song in liked_songs]
+    labelled += [(song, 0) for song in disliked_songs]
+    tracks = [song_to_track(song) for song, _ in labelled]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        all_features = list(pool.map(client.features_for_track, tracks))
+
+    rows = [
+        labelled_row(features, song, label)
+        for (song, label), features in zip(labelled, all_features)
+        if features
+    ]
+    return pd.DataFrame(rows)
 
-def train_model_in_memory(self, df):
+
+def build_pipeline(model=None, memory=None):
+    """
+    The scaler + classifier pipeline used for training, tuning and
+    inference. Scaling lives inside the pipeline, so cross-validation fits
+    it on each fold's training rows only.
+    Args:
+        model: classifier to put after the scaler, defaults to the random
+            forest with the hyperparameters from optimization.py
+        memory: joblib Memory or cache directory, caches the fitted scaler
+            so repeated fits on the same rows (grid candidates) reuse it
+    Returns:
+        Pipeline: unfitted ("scaler", "model") pipeline
+    """
+    if model is None:
+        model = RandomForestClassifier(
+            n_estimators=250, max_depth=6, min_samples_split=10, random_state=42
+        )
+    return Pipeline([("scaler", StandardScaler()), ("model", model)], memory=memory)
+
+
+def as_pipeline(model, scaler=None):
+    """
+    Wraps a separately pickled (model, scaler) pair, as older artifacts were
+    stored, into the pipeline shape. Pipelines pass through unchanged.
+    """
+    if isinstance(model, Pipeline) or scaler is None:
+        return model
+    return Pipeline([("scaler", scaler), ("model", model)])
+
+
+def model_path(profile=DEFAULT_PROFILE):
+    """
+    Where the tuned model for a feature profile lives, the full profile
+    keeps the original music_classifier.pkl
+    """
+    if profile == DEFAULT_PROFILE:
+        return os.path.join(MODEL_DIR, "music_classifier.pkl")
+    return os.path.join(MODEL_DIR, f"music_classifier_{profile}.pkl")
+
+
+def train_model_in_memory(df, memory=None):
     """
     Trains a model in-memory
     Args:
         df (pd.DataFrame): The training data
+        memory: optional transformer cache, see build_pipeline
     Returns:
-        model, scaler: The trained objects
+        Pipeline: the fitted scaler + model, or None
     """
     if df is None or len(df) < 2:
         print("Not enough data to train")
-        return None, None
+        return None
 
     try:
-        # remove metadata info
-        # TODO: maybe use artist to inform model later?
-        metadata_cols = [
-            "track_name",
-            "artist",
-            "track_id",
-            "preview_url",
-            "filename",
-            "label",
-        ]
-        existing_cols = [col for col in metadata_cols if col in df.columns]
-
-        # features
-        X = df.drop(columns=existing_cols)
-        # target var
-        y = df["label"]
-
-        # scale data
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-
-        # hyperparameters from optimization.py
-        model = RandomForestClassifier(
-            n_estimators=250, max_depth=6, min_samples_split=10, random_state=42
-        )
-        model.fit(X_scaled, y)
+        X, y = split_features(df)
+
+        pipeline = build_pipeline(memory=memory)
+        with span("train", rows=len(X)):
+            pipeline.fit(X, y)
 
-        return model, scaler
+        # the cache is only useful while fitting, don't pickle a path to it
+        pipeline.set_params(memory=None)
+        return pipeline
     except Exception as e:
         print(f"Error in training model : {e}")
-        return None, None
+        return None
+
+
+def training_metrics(model, df):
+    """
+    Summary numbers stored with a trained model
+    """
+    X, y = split_features(df)
+    return {
+        "train_accuracy": float(accuracy_score(y, model.predict(X))),
+        "n_liked": int((y == 1).sum()),
+        "n_disliked": int((y == 0).sum()),
+    }
@@ -0,0 +1,328 @@
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.join(current_dir, "..")
+sys.path.append(current_dir)
+
+from feature_engine import (
+    DEFAULT_PROFILE,
+    SCHEMA_VERSION,
+    profile_columns,
+    schema_hash,
+)
+
+DEFAULT_STORE_PATH = os.path.join(root_dir, "data", "raw", "training_store")
+
+
+def store_path(profile=DEFAULT_PROFILE):
+    """
+    Default store directory of a feature profile, one store per profile
+    """
+    if profile == DEFAULT_PROFILE:
+        return DEFAULT_STORE_PATH
+    return f"{DEFAULT_STORE_PATH}_{profile}"
+
+
+MANIFEST = "manifest.json"
+
+# rows per Parquet row group when checkpoint chunks are compacted, chunks
+# smaller than this are merged
+ROW_GROUP_ROWS = 16384
+
+# bump whenever the on-disk layout (manifest or chunk format) changes
+STORE_VERSION = "1"
+
+METADATA_TYPES = {
+    "track_id": pa.int64(),
+    "label": pa.int8(),
+    "track_name": pa.string(),
+    "artist": pa.string(),
+}
+
+
+class TrainingStore:
+    def __init__(
+        self,
+        path=DEFAULT_STORE_PATH,
+        columns=None,
+        overwrite=False,
+        checkpoint_rows=50,
+        profile=DEFAULT_PROFILE,
+    ):
+        """
+        Append-only, chunked Parquet store of training rows.
+
+        Each append() writes one part-NNNNN.parquet chunk. Feature columns
+        are float32 and metadata columns are typed (METADATA_TYPES).
+        manifest.json lists the chunks and their row counts, together with
+        the schema version and hash of the feature columns. A chunk only
+        counts as stored once the manifest names it, and both are written
+        to a temp file and renamed. A crash therefore loses at most the
+        chunk being written.
+
+        Readers can load a subset of columns and a row range. Only the
+        chunks overlapping the range are opened.
+
+        columns defaults to the feature profile's layout, and the profile
+        is part of the schema hash, so a store only ever holds one
+        profile's vectors.
+
+        overwrite=True starts from an empty store, whatever was there.
+        add() buffers single rows and appends them as a chunk every
+        checkpoint_rows rows. flush() writes out the remainder, then
+        compact() merges the small checkpoint chunks into one file of
+        ROW_GROUP_ROWS row groups, so a long run doesn't leave thousands
+        of tiny files behind.
+        """
+        self.path = path
+        self.profile = profile
+        self.columns = list(columns or profile_columns(profile))
+        self.checkpoint_rows = checkpoint_rows
+        self._buffer = []
+        self.schema = pa.schema(
+            [(col, pa.float32()) for col in self.columns]
+            + [(col, dtype) for col, dtype in METADATA_TYPES.items()]
+        )
+        if overwrite:
+            self.clear()
+        else:
+            self.manifest = self._load_manifest()
+
+    # -- manifest --
+
+    def _new_manifest(self):
+        return {
+            "store_version": STORE_VERSION,
+            "schema_version": SCHEMA_VERSION,
+            "schema_hash": schema_hash(self.columns, self.profile),
+            "profile": self.profile,
+            "feature_columns": self.columns,
+            "chunks": [],
+        }
+
+    def _load_manifest(self):
+        manifest_path = os.path.join(self.path, MANIFEST)
+        if not os.path.exists(manifest_path):
+            return self._new_manifest()
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        if manifest.get("store_version") != STORE_VERSION or manifest.get(
+            "schema_hash"
+        ) != schema_hash(self.columns, self.profile):
+            raise ValueError(
+                f"{self.path} was written with a different feature schema "
+                f"(schema version {manifest.get('schema_version')}), "
+                "re-ingest into a new store"
+            )
+        return manifest
+
+    def _write_manifest(self):
+        manifest_path = os.path.join(self.path, MANIFEST)
+        temp_path = f"{manifest_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temp_path, manifest_path)
+
+    # -- writing --
+
+    def append(self, rows):
+        """
+        Stores rows as a new chunk
+        Args:
+            rows (list | pd.DataFrame): feature dicts with label, track_id,
+                track_name and artist, as ingest produces them
+        Returns:
+            int: number of rows appended
+        """
+        df = pd.DataFrame(rows)
+        if df.empty:
+            return 0
+
+        missing = [col for col in self.columns if col not in df.columns]
+        if missing:
+            raise ValueError(f"rows are missing feature columns: {missing[:5]}")
+
+        # columns outside the schema are dropped, absent metadata is null
+        for col in METADATA_TYPES:
+            if col not in df.columns:
+                df[col] = None
+        table = pa.Table.from_pandas(
+            df[self.schema.names], schema=self.schema, preserve_index=False
+        )
+
+        os.makedirs(self.path, exist_ok=True)
+        name = self._next_chunk_name()
+        temp_path = os.path.join(self.path, f".{name}.tmp")
+        pq.write_table(table, temp_path)
+        os.replace(temp_path, os.path.join(self.path, name))
+
+        self.manifest["chunks"].append({"file": name, "rows": len(df)})
+        self._write_manifest()
+        return len(df)
+
+    def _next_chunk_name(self):
+        # compaction shrinks the chunk list, so names come from a counter
+        # (stores from before compaction existed never had one)
+        number = self.manifest.get("next_part", len(self.manifest["chunks"]))
+        self.manifest["next_part"] = number + 1
+        return f"part-{number:05d}.parquet"
+
+    def add(self, row):
+        """
+        Buffers one row, appending the buffer once it is checkpoint_rows long
+        """
+        self._buffer.append(row)
+        if len(self._buffer) >= self.checkpoint_rows:
+            rows, self._buffer = self._buffer, []
+            self.append(rows)
+
+    def flush(self):
+        """
+        Appends any buffered rows as a chunk, then compacts the store
+        Returns:
+            int: number of rows appended
+        """
+        rows, self._buffer = self._buffer, []
+        appended = self.append(rows)
+        self.compact()
+        return appended
+
+    def compact(self, row_group_rows=ROW_GROUP_ROWS):
+        """
+        Rewrites every run of consecutive chunks smaller than row_group_rows
+        as one chunk with row groups of row_group_rows rows. Row order is
+        kept. The merged chunk is renamed into place and the manifest
+        swapped before the old chunks are deleted, so a crash at any point
+        leaves a complete store.
+        Returns:
+            int: number of chunks removed
+        """
+        chunks = self.manifest["chunks"]
+        runs, run = [], []
+        for chunk in chunks + [None]:
+            if chunk is not None and chunk["rows"] < row_group_rows:
+                run.append(chunk)
+                continue
+            if len(run) > 1:
+                runs.append(run)
+            run = []
+        if not runs:
+            return 0
+
+        replaced = {}
+        for run in runs:
+            name = self._next_chunk_name()
+            temp_path = os.path.join(self.path, f".{name}.tmp")
+            # read chunk by chunk, write a row group whenever one is full
+            pending = []
+            with pq.ParquetWriter(temp_path, self.schema) as writer:
+                for chunk in run:
+                    pending.append(
+                        pq.read_table(os.path.join(self.path, chunk["file"]))
+                    )
+                    table = pa.concat_tables(pending)
+                    full = len(table) - len(table) % row_group_rows
+                    if full:
+                        writer.write_table(table.slice(0, full), row_group_rows)
+                        table = table.slice(full)
+                    pending = [table]
+                if len(pending[0]):
+                    writer.write_table(pending[0], row_group_rows)
+            os.replace(temp_path, os.path.join(self.path, name))
+
+            merged = {"file": name, "rows": sum(chunk["rows"] for chunk in run)}
+            replaced[run[0]["file"]] = merged
+            for chunk in run[1:]:
+                replaced[chunk["file"]] = None
+
+        kept = []
+        for chunk in chunks:
+            if chunk["file"] not in replaced:
+                kept.append(chunk)
+            elif replaced[chunk["file"]] is not None:
+                kept.append(replaced[chunk["file"]])
+        self.manifest["chunks"] = kept
+        self._write_manifest()
+
+        for file in replaced:
+            os.remove(os.path.join(self.path, file))
+        return len(replaced) - len(runs)
+
+    def clear(self):
+        """
+        Deletes every stored chunk
+        """
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.manifest = self._new_manifest()
+
+    # -- reading --
+
+    def __len__(self):
+        return sum(chunk["rows"] for chunk in self.manifest["chunks"])
+
+    def read(self, columns=None, start=0, stop=None):
+        """
+        Loads stored rows into a DataFrame
+        Args:
+            columns (list): columns to load, all of them by default
+            start (int): first row to load
+            stop (int): row to stop before, the end of the store by default
+        Returns:
+            pd.DataFrame: feature columns keep their float32 dtype
+        """
+        columns = list(columns) if columns is not None else self.schema.names
+        stop = len(self) if stop is None else min(stop, len(self))
+
+        tables = []
+        offset = 0
+        for chunk in self.manifest["chunks"]:
+            chunk_start, offset = offset, offset + chunk["rows"]
+            if offset <= start or chunk_start >= stop:
+                continue
+
+            table = pq.read_table(
+                os.path.join(self.path, chunk["file"]), columns=columns
+            )
+            lo = max(start - chunk_start, 0)
+            hi = min(stop, offset) - chunk_start
+            tables.append(table.slice(lo, hi - lo))
+
+        if not tables:
+            return pd.DataFrame(
+                {
+                    col: pd.Series(dtype=self.schema.field(col).type.to_pandas_dtype())
+                    for col in columns
+                }
+            )
+        return pa.concat_tables(tables).to_pandas()
+
+    def track_ids(self):
+        """
+        Every stored track ID, only the track_id column is read
+        """
+        ids = set()
+        for chunk in self.manifest["chunks"]:
+            table = pq.read_table(
+                os.path.join(self.path, chunk["file"]), columns=["track_id"]
+            )
+            ids.update(table.column("track_id").to_pylist())
+        return ids
+
+    def read_features(self, start=0, stop=None):
+        """
+        Feature matrix and labels for a row range
+        Returns:
+            (pd.DataFrame, pd.Series): float32 features and int labels
+        """
+        df = self.read(self.columns + ["label"], start, stop)
+        return df[self.columns], df["label"].astype(np.int64)
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "..", "src"))
+
+from async_audio_client import AsyncAudioClient
+from audio_client import AudioClient
+from catalog_store import CatalogStore
+from feature_cache import FeatureCache
+
+# how long the fake API holds each request, long enough for lookups to
+# overlap
+RESPONSE_DELAY = 0.1
+
+
+class FakeDeezer(BaseHTTPRequestHandler):
+    """
+    /track/<id> answers like Deezer does: the track, a 200 with an error
+    body for "missing", and a 500 for "broken". Tracks how many requests
+    are being served at once.
+    """
+
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+    served = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.served += 1
+            cls.peak = max(cls.peak, cls.in_flight)
+        try:
+            time.sleep(RESPONSE_DELAY)
+            track_id = self.path.rstrip("/").split("/")[-1]
+            if track_id == "broken":
+                self.respond(500, {})
+            elif track_id == "missing":
+                self.respond(200, {"error": {"type": "DataException", "code": 800}})
+            else:
+                self.respond(
+                    200,
+                    {
+                        "id": int(track_id),
+                        "title": f"Track {track_id}",
+                        "artist": {"name": "Artist"},
+                        "preview": f"http://localhost/{track_id}.mp3",
+                    },
+                )
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def respond(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api_url():
+    FakeDeezer.in_flight = FakeDeezer.peak = FakeDeezer.served = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeDeezer)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(api_url, tmp_path):
+    return AudioClient(
+        temp_directory=str(tmp_path / "temp"),
+        feature_cache=FeatureCache(str(tmp_path / "features.sqlite")),
+        catalog_store=CatalogStore(str(tmp_path / "catalog.sqlite")),
+        max_retries=0,
+        api_url=api_url,
+    )
+
+
+def test_get_tracks_caps_requests_in_flight(client):
+    async_client = AsyncAudioClient(client, max_concurrency=3)
+
+    start = time.perf_counter()
+    tracks = asyncio.run(async_client.get_tracks(list(range(1, 10))))
+    elapsed = time.perf_counter() - start
+
+    assert [track["trackId"] for track in tracks] == list(range(1, 10))
+    assert FakeDeezer.peak == 3
+    # three waves of three, not nine round trips one after another
+    assert elapsed < 9 * RESPONSE_DELAY
+
+
+def test_get_tracks_returns_none_for_failed_lookups(client):
+    async_client = AsyncAudioClient(client, max_concurrency=4)
+
+    tracks = asyncio.run(async_client.get_tracks([1, "missing", "broken", None, 2]))
+
+    assert tracks[0]["trackName"] == "Track 1"
+    assert tracks[1:4] == [None, None, None]
+    assert tracks[4]["trackId"] == 2
+    # None is skipped without a request
+    assert FakeDeezer.served == 4
@@ -0,0 +1,73 @@
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "..", "src"))
+
+from audio_client import SEARCH_POOL, AudioClient
+from catalog_store import CatalogStore
+from feature_cache import FeatureCache
+
+
+class StubResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+def search_result(track_id, title):
+    return {
+        "id": track_id,
+        "title": title,
+        "artist": {"name": "Artist"},
+        "album": {"cover_medium": None},
+        "preview": f"http://localhost/{track_id}.mp3",
+    }
+
+
+def stub_client(tmp_path, results, requests):
+    client = AudioClient(
+        temp_directory=str(tmp_path / "temp"),
+        feature_cache=FeatureCache(str(tmp_path / "features.sqlite")),
+        catalog_store=CatalogStore(str(tmp_path / "catalog.sqlite")),
+    )
+
+    def get(url, params=None, **kwargs):
+        requests.append(params)
+        return StubResponse({"data": results[: params["limit"]]})
+
+    client._get = get
+    return client
+
+
+def test_search_reranks_beyond_a_small_limit(tmp_path):
+    # the best title match is Deezer's fourth hit
+    results = [
+        search_result(1, "Intro"),
+        search_result(2, "Remix"),
+        search_result(3, "Live"),
+        search_result(4, "Bohemian Rhapsody"),
+    ]
+    requests = []
+    client = stub_client(tmp_path, results, requests)
+
+    tracks = client.search_tracks("bohemian rhapsody", limit=1)
+
+    assert [track["trackId"] for track in tracks] == [4]
+    assert requests == [{"q": "bohemian rhapsody", "limit": SEARCH_POOL}]
+
+
+def test_search_asks_for_large_limits(tmp_path):
+    results = [search_result(i, f"Song {i}") for i in range(40)]
+    requests = []
+    client = stub_client(tmp_path, results, requests)
+
+    tracks = client.search_tracks("artist", limit=25)
+
+    assert len(tracks) == 25
+    assert requests[0]["limit"] == 25
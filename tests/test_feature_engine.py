@@ -0,0 +1,54 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "..", "src"))
+
+from feature_engine import (
+    FEATURE_COLUMNS,
+    PROFILES,
+    FeatureEngine,
+    get_profile,
+    profile_columns,
+    schema_hash,
+)
+
+# schema_hash of the layout before profiles existed, models trained on it
+# must keep loading
+FULL_SCHEMA_HASH = "ac739235fed4efca"
+
+
+def clip(profile, seed=0):
+    settings = get_profile(profile)
+    rng = np.random.default_rng(seed)
+    n = settings["sample_rate"] * settings["duration"]
+    t = np.arange(n) / settings["sample_rate"]
+    y = np.sin(2 * np.pi * 220 * t) + 0.1 * rng.standard_normal(n)
+    return y.astype(np.float32), settings["sample_rate"]
+
+
+def test_full_profile_keeps_the_original_layout():
+    assert len(FEATURE_COLUMNS) == 257
+    assert profile_columns("full") == FEATURE_COLUMNS
+    assert schema_hash() == FULL_SCHEMA_HASH
+    assert schema_hash(profile_columns("full"), "full") == FULL_SCHEMA_HASH
+
+
+@pytest.mark.parametrize("profile", sorted(PROFILES))
+def test_vectors_are_laid_out_as_the_profile_columns(profile):
+    engine = FeatureEngine.from_profile(profile)
+    y, sample_rate = clip(profile)
+
+    vector = engine.extract_vector(y, sample_rate)
+
+    assert engine.columns == profile_columns(profile)
+    assert len(vector) == len(profile_columns(profile))
+    assert np.isfinite(vector).all()
+
+
+def test_profiles_never_share_a_schema_hash():
+    hashes = {schema_hash(profile_columns(p), p) for p in PROFILES}
+    assert len(hashes) == len(PROFILES)
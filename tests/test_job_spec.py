@@ -0,0 +1,37 @@
+import argparse
+import os
+import sys
+
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "..", "src"))
+
+from job_spec import in_shard, parse_shard
+
+
+def shard_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shard", type=parse_shard, default=None)
+    return parser
+
+
+def test_shard_argument_parses():
+    assert shard_parser().parse_args(["--shard", "1/4"]).shard == (1, 4)
+
+
+@pytest.mark.parametrize(
+    "text, message",
+    [("half", "shard must look like 0/4"), ("4/4", "shard index must be in")],
+)
+def test_bad_shard_argument_reports_why(text, message, capsys):
+    with pytest.raises(SystemExit):
+        shard_parser().parse_args(["--shard", text])
+    # argparse prints the message itself, not "invalid parse_shard value"
+    assert message in capsys.readouterr().err
+
+
+def test_shards_split_every_track_once():
+    shards = [(index, 4) for index in range(4)]
+    for track_id in range(200):
+        assert sum(in_shard(track_id, shard) for shard in shards) == 1
@@ -0,0 +1,124 @@
+import os
+import shutil
+import sys
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "..", "src"))
+
+import library_scanner
+from audio_client import AudioClient
+from catalog_store import CatalogStore
+from feature_cache import FeatureCache
+from library_scanner import LibraryIndex, scan_library
+
+SAMPLE_RATE = 22050
+
+
+def write_tone(path, frequency, seconds=1.0):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    sf.write(path, 0.5 * np.sin(2 * np.pi * frequency * t), SAMPLE_RATE)
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "music"
+    (root / "album").mkdir(parents=True)
+    write_tone(root / "album" / "a.wav", 220)
+    write_tone(root / "album" / "b.wav", 330)
+    write_tone(root / "c.wav", 440)
+    (root / "notes.txt").write_text("not audio")
+    index = LibraryIndex(str(tmp_path / "library.sqlite"))
+    return root, index
+
+
+def scan(root, index):
+    return scan_library([str(root)], index=index, workers=1)
+
+
+def test_scan_tracks_unchanged_moved_changed_and_removed(library):
+    root, index = library
+
+    first = scan(root, index)
+    assert first["extracted"] == 3
+    assert len(index) == 3
+    features = dict(index.items())
+    assert set(features) == {
+        str(root / "album" / "a.wav"),
+        str(root / "album" / "b.wav"),
+        str(root / "c.wav"),
+    }
+    # the sources are the user's files, extraction leaves them in place
+    assert all(os.path.exists(path) for path in features)
+
+    # nothing touched: no file is opened again
+    assert scan(root, index)["unchanged"] == 3
+
+    # a moved file keeps its features through the content hash
+    os.rename(root / "c.wav", root / "album" / "c.wav")
+    moved = scan(root, index)
+    assert (moved["reused"], moved["extracted"], moved["removed"]) == (1, 0, 1)
+    assert (
+        dict(index.items())[str(root / "album" / "c.wav")]
+        == features[str(root / "c.wav")]
+    )
+
+    # new contents under the same name are extracted again
+    write_tone(root / "album" / "a.wav", 880, seconds=1.5)
+    changed = scan(root, index)
+    assert (changed["unchanged"], changed["extracted"]) == (2, 1)
+    assert (
+        dict(index.items())[str(root / "album" / "a.wav")]
+        != features[str(root / "album" / "a.wav")]
+    )
+
+    # deleted files leave the index
+    os.remove(root / "album" / "b.wav")
+    removed = scan(root, index)
+    assert removed["removed"] == 1
+    assert len(index) == 2
+
+
+def test_unreadable_directories_keep_their_rows(library, monkeypatch):
+    root, index = library
+    scan(root, index)
+
+    # a permission error on one directory
+    album = str(root / "album")
+    scandir = os.scandir
+
+    def failing_scandir(path):
+        if os.path.abspath(path) == album:
+            raise PermissionError(13, "Permission denied", path)
+        return scandir(path)
+
+    monkeypatch.setattr(library_scanner.os, "scandir", failing_scandir)
+    stats = scan(root, index)
+    assert (stats["unchanged"], stats["removed"]) == (1, 0)
+    assert len(index) == 3
+    monkeypatch.undo()
+
+    # the whole root gone, e.g. an unmounted drive
+    shutil.move(str(root), str(root) + "-elsewhere")
+    stats = scan(root, index)
+    assert stats["removed"] == 0
+    assert len(index) == 3
+
+
+def test_extract_features_keeps_the_file_with_delete_false(tmp_path):
+    path = tmp_path / "song.wav"
+    write_tone(path, 440)
+    client = AudioClient(
+        temp_directory=str(tmp_path / "temp"),
+        feature_cache=FeatureCache(str(tmp_path / "features.sqlite")),
+        catalog_store=CatalogStore(str(tmp_path / "catalog.sqlite")),
+    )
+
+    assert client.extract_features(str(path), delete=False)
+    assert path.exists()
+
+    assert client.extract_features(str(path))
+    assert not path.exists()
@@ -0,0 +1,56 @@
+import os
+import sys
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "..", "src"))
+
+from model_registry import ModelRegistry
+from model_store import ModelStore
+
+
+class StaleStore(ModelStore):
+    """
+    Sees the version list as it was before another writer saved, the
+    window in which two concurrent saves pick the same number
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stale = True
+
+    def versions(self, profile_id):
+        if self.stale:
+            self.stale = False
+            return []
+        return super().versions(profile_id)
+
+
+def test_save_retries_when_the_version_is_taken(tmp_path):
+    store = ModelStore(str(tmp_path), keep=10, registry=ModelRegistry())
+    assert store.save("alice", {"model": 1}, "hash", 10) == 1
+
+    stale = StaleStore(str(tmp_path), keep=10, registry=ModelRegistry())
+    assert stale.save("alice", {"model": 2}, "hash", 20) == 2
+
+    assert store.versions("alice") == [1, 2]
+    model, meta = store.load_latest("alice", "hash")
+    assert model == {"model": 2}
+    assert meta["version"] == 2
+
+
+def test_concurrent_saves_get_distinct_versions(tmp_path):
+    store = ModelStore(str(tmp_path), keep=100, registry=ModelRegistry())
+    saved = []
+
+    def save(i):
+        saved.append(store.save("bob", {"model": i}, "hash", i))
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(saved) == list(range(1, 9))
+    assert store.versions("bob") == list(range(1, 9))
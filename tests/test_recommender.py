@@ -0,0 +1,40 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "..", "src"))
+
+from catalog_store import CatalogStore
+from feature_engine import FEATURE_COLUMNS
+from recommender import load_catalog, recommend
+
+
+def fitted_model():
+    # likes are the tracks with a high first feature
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((200, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    y = (X[FEATURE_COLUMNS[0]] > 0.5).astype(int)
+    return Pipeline(
+        [("scaler", StandardScaler()), ("model", LogisticRegression())]
+    ).fit(X, y)
+
+
+def test_recommend_skips_placeholder_ids(tmp_path):
+    store = CatalogStore(str(tmp_path / "catalog.sqlite"))
+    for track_id in range(1, 6):
+        features = {col: 0.5 for col in FEATURE_COLUMNS}
+        features[FEATURE_COLUMNS[0]] = track_id / 5
+        store.put(track_id, features, {"trackName": f"Track {track_id}"})
+    catalog = load_catalog(store)
+
+    picks = recommend(fitted_model(), catalog, k=2, exclude={5, "diag_3", "4"})
+
+    # 5 and 4 are excluded, the diagnostic placeholder is ignored
+    assert [pick["trackId"] for pick in picks] == [3, 2]
+    assert picks[0]["trackName"] == "Track 3"
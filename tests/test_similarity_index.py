@@ -0,0 +1,88 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "..", "src"))
+
+from feature_cache import FeatureCache
+from feature_engine import FEATURE_COLUMNS, profile_columns, vector_to_dict
+from similarity_index import SimilarityIndex
+
+
+def clustered(n=2000, n_clusters=20, seed=0, columns=FEATURE_COLUMNS):
+    """
+    Raw vectors scattered around a few centres, like genres in a catalog
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(scale=5, size=(n_clusters, len(columns)))
+    X = centres[rng.integers(n_clusters, size=n)]
+    X += rng.normal(size=X.shape)
+    return np.arange(1, n + 1), X.astype(np.float32)
+
+
+def exact_search(index, X, ids, query, k, exclude=()):
+    scores = index._normalize(X) @ index._normalize(query)[0]
+    order = [i for i in np.argsort(-scores) if ids[i] not in exclude]
+    return [int(ids[i]) for i in order[:k]]
+
+
+@pytest.fixture(scope="module")
+def built():
+    ids, X = clustered()
+    return SimilarityIndex().build(ids, X), ids, X
+
+
+def test_search_recall_against_exact(built):
+    index, ids, X = built
+    queries = np.random.default_rng(1).choice(len(X), 50, replace=False)
+
+    found = total = 0
+    for i in queries:
+        expected = exact_search(index, X, ids, X[i], 10)
+        approximate = [track_id for track_id, _ in index.search(X[i], k=10)]
+        found += len(set(expected) & set(approximate))
+        total += len(expected)
+    assert found / total >= 0.9
+
+    # probing every list is an exact search
+    everything = len(index.centroids)
+    for i in queries[:10]:
+        assert [
+            track_id for track_id, _ in index.search(X[i], 10, n_probe=everything)
+        ] == exact_search(index, X, ids, X[i], 10)
+
+
+def test_exclude_leaves_tracks_out(built):
+    index, ids, X = built
+    everything = len(index.centroids)
+    nearest = [track_id for track_id, _ in index.search(X[0], 5, n_probe=everything)]
+    assert nearest[0] == ids[0]
+
+    exclude = set(nearest[:3])
+    results = index.search(X[0], 5, exclude=exclude, n_probe=everything)
+    assert [track_id for track_id, _ in results] == exact_search(
+        index, X, ids, X[0], 5, exclude
+    )
+
+    # a track is never its own neighbour
+    similar = index.similar_to(ids[0], k=5, n_probe=everything)
+    assert [track_id for track_id, _ in similar] == exact_search(
+        index, X, ids, X[0], 5, {ids[0]}
+    )
+
+
+def test_from_cache_uses_the_cache_profile(tmp_path):
+    columns = profile_columns("fast")
+    ids, X = clustered(n=200, columns=columns)
+    cache = FeatureCache(str(tmp_path / "features.sqlite"), profile="fast")
+    for track_id, vector in zip(ids, X):
+        cache.put(int(track_id), vector_to_dict(vector, columns))
+
+    index = SimilarityIndex.from_cache(cache)
+
+    assert len(index) == 200
+    assert index.columns == columns
+    assert index.search(X[7], k=1, n_probe=len(index.centroids))[0][0] == ids[7]
@@ -0,0 +1,128 @@
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "..", "src"))
+
+from feature_engine import PROFILES, FeatureEngine, get_profile
+from streaming_extractor import TUNING_SECONDS, StreamingExtractor
+
+SAMPLE_RATE = 22050
+
+# chroma of streamed audio against the in-memory engine, chroma values
+# lie in [0, 1]
+CHROMA_TOLERANCE = 1e-5
+
+# whole vectors of inputs up to TUNING_SECONDS, float32 summaries of
+# blocks against summaries of the whole matrix
+VECTOR_RTOL = 1e-4
+VECTOR_ATOL = 1e-7
+
+
+def detuned_chords(duration, cents=30, seed=0, sample_rate=SAMPLE_RATE):
+    """
+    Major triads a fourth apart every two seconds, all tuned cents above
+    A440, plus a little noise
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    y = np.zeros_like(t)
+    step = 2 * sample_rate
+    for i, start in enumerate(range(0, len(t), step)):
+        segment = t[start : start + step]
+        root = 48 + (i * 5) % 12
+        for note in (root, root + 4, root + 7):
+            frequency = 440 * 2 ** ((note - 57 + cents / 100) / 12)
+            y[start : start + step] += np.sin(2 * np.pi * frequency * segment)
+    y += 0.05 * rng.standard_normal(len(t))
+    return (y / np.abs(y).max()).astype(np.float32)
+
+
+def with_clicks(y, bpm, sample_rate=SAMPLE_RATE):
+    """
+    y with a decaying noise burst on every beat, so there is a tempo to
+    find
+    """
+    rng = np.random.default_rng(1)
+    click = rng.standard_normal(sample_rate // 50) * np.exp(
+        -np.arange(sample_rate // 50) / (sample_rate / 500)
+    )
+    y = y.copy()
+    for start in range(0, len(y) - len(click), int(60 / bpm * sample_rate)):
+        y[start : start + len(click)] += click
+    return (y / np.abs(y).max()).astype(np.float32)
+
+
+def stream(engine, y, block_seconds, sample_rate=SAMPLE_RATE):
+    extractor = StreamingExtractor(engine, sample_rate)
+    block = int(block_seconds * sample_rate)
+    for start in range(0, len(y), block):
+        extractor.update(y[start : start + block])
+    return extractor.finish()
+
+
+def stream_peak_memory(engine, minutes, block_seconds=5.0):
+    """
+    Peak traced memory while streaming minutes of generated audio, one
+    block made at a time so the input itself is never held whole
+    """
+    rng = np.random.default_rng(0)
+    block = int(block_seconds * SAMPLE_RATE)
+    tracemalloc.start()
+    try:
+        extractor = StreamingExtractor(engine, SAMPLE_RATE)
+        for _ in range(int(minutes * 60 / block_seconds)):
+            extractor.update(0.1 * rng.standard_normal(block).astype(np.float32))
+        extractor.finish()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("duration", [TUNING_SECONDS - 10, TUNING_SECONDS + 15])
+@pytest.mark.parametrize("block_seconds", [0.5, 5.0])
+def test_chroma_matches_in_memory(duration, block_seconds):
+    # the first block alone used to set the tuning, which put 5 s blocks
+    # about 6% off the engine
+    engine = FeatureEngine()
+    y = detuned_chords(duration)
+    chroma = engine.layout["chroma"].ravel()
+
+    expected = engine.extract_vector(y, SAMPLE_RATE)[chroma]
+    streamed = stream(engine, y, block_seconds)[chroma]
+
+    np.testing.assert_allclose(streamed, expected, rtol=0, atol=CHROMA_TOLERANCE)
+
+
+@pytest.mark.parametrize("profile", sorted(PROFILES))
+@pytest.mark.parametrize("duration", [10, TUNING_SECONDS])
+def test_vector_matches_in_memory(profile, duration):
+    # the onset envelope used to run two frames ahead of onset_strength's,
+    # which moved the tempo, and zcr zero-padded where librosa repeats the
+    # edge sample
+    engine = FeatureEngine.from_profile(profile)
+    sample_rate = get_profile(profile)["sample_rate"]
+    y = with_clicks(detuned_chords(duration, sample_rate=sample_rate), 141, sample_rate)
+
+    expected = engine.extract_vector(y, sample_rate)
+    streamed = stream(engine, y, 5.0, sample_rate)
+
+    if "beat_interval" in engine.layout:
+        assert np.count_nonzero(expected[engine.layout["beat_interval"]])
+    np.testing.assert_allclose(streamed, expected, rtol=VECTOR_RTOL, atol=VECTOR_ATOL)
+
+
+def test_peak_memory_does_not_grow_with_length():
+    engine = FeatureEngine()
+    # librosa and numba allocate their caches on first use
+    stream_peak_memory(engine, 0.25)
+
+    one_minute = stream_peak_memory(engine, 1)
+    ten_minutes = stream_peak_memory(engine, 10)
+
+    # the onset envelope is the only per-frame state, ~50 KB for ten minutes
+    assert ten_minutes < one_minute * 1.1
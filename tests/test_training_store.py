@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pyarrow.parquet as pq
+import pytest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, "..", "src"))
+
+from feature_engine import FEATURE_COLUMNS
+from training_store import TrainingStore
+
+
+def make_row(track_id):
+    row = {col: float(track_id) for col in FEATURE_COLUMNS}
+    row.update(label=track_id % 2, track_id=track_id, track_name=f"track {track_id}")
+    return row
+
+
+def test_flush_compacts_checkpoint_chunks(tmp_path):
+    path = str(tmp_path / "store")
+    store = TrainingStore(path, checkpoint_rows=10)
+    for track_id in range(95):
+        store.add(make_row(track_id))
+    assert len(store.manifest["chunks"]) == 9
+
+    store.flush()
+
+    # one chunk for the whole run, and no orphaned checkpoint files
+    assert len(store.manifest["chunks"]) == 1
+    assert sorted(os.listdir(path)) == sorted(
+        ["manifest.json", store.manifest["chunks"][0]["file"]]
+    )
+
+    reopened = TrainingStore(path)
+    assert len(reopened) == 95
+    assert reopened.track_ids() == set(range(95))
+    X, y = reopened.read_features(start=40, stop=45)
+    assert X[FEATURE_COLUMNS[0]].tolist() == [40.0, 41.0, 42.0, 43.0, 44.0]
+    assert y.tolist() == [0, 1, 0, 1, 0]
+
+
+def test_compact_writes_full_row_groups(tmp_path):
+    store = TrainingStore(str(tmp_path / "store"), checkpoint_rows=30)
+    for track_id in range(240):
+        store.add(make_row(track_id))
+
+    assert store.compact(row_group_rows=100) == 7
+
+    chunk = os.path.join(store.path, store.manifest["chunks"][0]["file"])
+    metadata = pq.ParquetFile(chunk).metadata
+    row_groups = [
+        metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)
+    ]
+    assert row_groups == [100, 100, 40]
+    assert store.read(["track_id"])["track_id"].tolist() == list(range(240))
+
+
+def test_store_refuses_another_profile(tmp_path):
+    path = str(tmp_path / "store")
+    TrainingStore(path).append([make_row(track_id) for track_id in range(3)])
+
+    with pytest.raises(ValueError, match="different feature schema"):
+        TrainingStore(path, profile="fast")
+
+    # the store written with the full profile still opens with it
+    assert len(TrainingStore(path, profile="full")) == 3